@@ -1,30 +1,25 @@
 from django.contrib import admin
-from django.http import HttpResponse
 from .models import AuditLog
-import openpyxl
-from openpyxl.utils import get_column_letter
+from backend.core.exports import csv_response, export_chunk_size, xlsx_response
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ("timestamp", "actor", "action", "content_type", "object_id", "short_desc")
     list_filter = ("action", "timestamp", "content_type")
     search_fields = ("description", "object_id", "actor__username")
-    actions = ["export_to_excel"]
+    list_select_related = ("actor", "content_type")
+    actions = ["export_to_excel", "export_to_csv"]
+
+    EXPORT_HEADERS = ["Дата/час", "Користувач", "Дія", "Модель", "ID об'єкта", "Опис", "Зміни (JSON)"]
 
     def short_desc(self, obj):
         return (obj.description or "")[:80]
 
-    @admin.action(description="Експорт у Excel")
-    def export_to_excel(self, request, queryset):
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Audit"
-
-        headers = ["Дата/час", "Користувач", "Дія", "Модель", "ID об'єкта", "Опис", "Зміни (JSON)"]
-        ws.append(headers)
-
-        for log in queryset.order_by("timestamp"):
-            ws.append([
+    def _export_rows(self, queryset):
+        # actor і content_type — одним JOIN-ом; записи читаються порціями
+        logs = queryset.select_related("actor", "content_type").order_by("timestamp")
+        for log in logs.iterator(chunk_size=export_chunk_size()):
+            yield [
                 log.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
                 getattr(log.actor, "username", "") if log.actor else "",
                 log.get_action_display(),
@@ -32,14 +27,19 @@ class AuditLogAdmin(admin.ModelAdmin):
                 str(log.object_id),
                 log.description or "",
                 "" if not log.changes else str(log.changes),
-            ])
+            ]
 
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col)].width = 24
-
-        resp = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    @admin.action(description="Експорт у Excel")
+    def export_to_excel(self, request, queryset):
+        return xlsx_response(
+            request,
+            self.EXPORT_HEADERS,
+            self._export_rows(queryset),
+            "audit_export.xlsx",
+            title="Audit",
+            widths=[24] * len(self.EXPORT_HEADERS),
         )
-        resp["Content-Disposition"] = 'attachment; filename="audit_export.xlsx"'
-        wb.save(resp)
-        return resp
+
+    @admin.action(description="Експорт у CSV (потоково)")
+    def export_to_csv(self, request, queryset):
+        return csv_response(request, self.EXPORT_HEADERS, self._export_rows(queryset), "audit_export.csv")
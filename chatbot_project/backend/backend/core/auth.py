@@ -1,10 +1,87 @@
 # backend/core/auth.py
+import json
 import logging
+import time
+from django.conf import settings
 from django.http import JsonResponse
 from qa_app.models import AllowedTelegramUser
+from backend.core.redis_client import REDIS_ERRORS, get_async_redis, get_redis
 
 logger = logging.getLogger("backend.core")
 
+_CACHE_PREFIX = "auth:tg:v1:"
+_FIELDS = ["id", "user_id", "full_name", "status"]
+_MISSING = object()
+
+# Telegram ID -> (monotonic expires_at, поля активного користувача або None = доступ заборонено)
+_local: dict[int, tuple[float, list | None]] = {}
+
+
+def _ttls() -> tuple[float, float]:
+    """
+    (TTL локального кешу воркера, TTL у Redis).
+    Зі спільним Redis локальний кеш короткий: інвалідація сигналом чистить Redis і лише свій процес.
+    """
+    ttl = float(getattr(settings, "AUTH_CACHE_TTL", 60))
+    if getattr(settings, "REDIS_URL", ""):
+        return min(ttl, float(getattr(settings, "AUTH_LOCAL_CACHE_TTL", 5))), ttl
+    return ttl, ttl
+
+
+def _materialize(values: list | None):
+    # новий екземпляр на кожен запит — його безпечно використовувати як FK (asked_by)
+    return AllowedTelegramUser.from_db("default", _FIELDS, values) if values is not None else None
+
+
+async def resolve_telegram_user(uid: int):
+    """Активний AllowedTelegramUser або None: локальний TTL-кеш → Redis → БД."""
+    now = time.monotonic()
+    hit = _local.get(uid)
+    if hit is not None and hit[0] > now:
+        return _materialize(hit[1])
+
+    local_ttl, shared_ttl = _ttls()
+    values = _MISSING
+    client = get_async_redis()
+    if client is not None:
+        try:
+            raw = await client.get(f"{_CACHE_PREFIX}{uid}")
+            if raw is not None:
+                values = json.loads(raw)
+        except REDIS_ERRORS:
+            client = None
+
+    if values is _MISSING:
+        user = await (
+            AllowedTelegramUser.objects.filter(user_id=uid, status=AllowedTelegramUser.Status.ACTIVE)
+            .only(*_FIELDS).afirst()
+        )
+        values = [getattr(user, f) for f in _FIELDS] if user is not None else None
+        if client is not None:
+            try:
+                await client.set(f"{_CACHE_PREFIX}{uid}", json.dumps(values), ex=int(shared_ttl))
+            except REDIS_ERRORS:
+                pass
+
+    if len(_local) > 10_000:
+        for stale in [key for key, (expires_at, _) in _local.items() if expires_at <= now]:
+            del _local[stale]
+    _local[uid] = (now + local_ttl, values)
+    return _materialize(values)
+
+
+def invalidate_telegram_users(*user_ids: int) -> None:
+    """Скидає кешоване рішення (сигнали AllowedTelegramUser і масові дії адмінки через update())."""
+    for uid in user_ids:
+        _local.pop(uid, None)
+    client = get_redis()
+    if client is not None and user_ids:
+        try:
+            client.delete(*[f"{_CACHE_PREFIX}{uid}" for uid in user_ids])
+        except REDIS_ERRORS:
+            logger.warning("AUTH cache: Redis invalidation failed for %s", user_ids)
+
+
 def require_telegram_access(view):
     async def wrapper(request, *args, **kwargs):
         tg_id = request.headers.get("X-Telegram-Id")
@@ -18,11 +95,13 @@ def require_telegram_access(view):
             logger.warning("AUTH FAIL: Bad X-Telegram-Id format: %s", tg_id)
             return JsonResponse({"error": "Bad X-Telegram-Id"}, status=403)
 
-        exists = await AllowedTelegramUser.objects.filter(user_id=uid, status=AllowedTelegramUser.Status.ACTIVE).aexists()
-        if not exists:
+        user = await resolve_telegram_user(uid)
+        if user is None:
             logger.warning("AUTH FAIL: Telegram ID not allowed: %s", uid)
             return JsonResponse({"error": "Telegram ID not allowed"}, status=403)
 
         logger.info("AUTH PASS: Telegram ID allowed: %s", uid)
+        # view бере користувача звідси, без повторного запиту до БД
+        request.telegram_user = user
         return await view(request, *args, **kwargs)
     return wrapper
@@ -0,0 +1,119 @@
+# backend/core/exports.py
+import csv
+import tempfile
+from itertools import islice
+from typing import Iterable, Sequence
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+def export_chunk_size() -> int:
+    """Скільки рядків тягнути з БД за раз (QuerySet.iterator(chunk_size=...)) при експорті."""
+    return int(getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+
+
+async def _aiter_batches(iterable: Iterable, batch_size: int):
+    """
+    Async-обгортка над sync-ітератором для ASGI: Django не вміє ліниво віддавати sync-генератор
+    під ASGI (вичитує його в list цілком), тому тягнемо порції через sync_to_async.
+    thread_sensitive — усі порції в одному потоці, тобто на тому ж з'єднанні з БД (server-side cursor).
+    """
+    iterator = iter(iterable)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)), thread_sensitive=True)
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        for item in batch:
+            yield item
+
+
+def _streaming_content(request, content: Iterable, batch_size: int):
+    """Під ASGI — async-ітератор, під WSGI — сам sync-генератор."""
+    if isinstance(request, ASGIRequest):
+        return _aiter_batches(content, batch_size)
+    return content
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() повертає рядок замість запису в буфер."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(request, headers: Sequence[str], rows: Iterable[Sequence], filename: str) -> StreamingHttpResponse:
+    """
+    CSV, що віддається потоком: рядки формуються по мірі читання rows (iterator з БД),
+    тож пам'ять воркера не залежить від обсягу, а перші байти йдуть клієнту одразу.
+    """
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield "\ufeff"  # BOM — щоб Excel правильно відкрив UTF-8 (кирилиця)
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(
+        _streaming_content(request, stream(), export_chunk_size()),
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _file_blocks(fh):
+    try:
+        while block := fh.read(FILE_BLOCK_SIZE):
+            yield block
+    finally:
+        fh.close()
+
+
+def xlsx_response(
+    request,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    filename: str,
+    *,
+    title: str = "Sheet",
+    widths: Sequence[int] = (),
+):
+    """
+    .xlsx у write-only режимі openpyxl: рядки одразу пишуться у тимчасові XML-файли,
+    книга збирається у тимчасовий файл на диску і віддається шматками
+    (FileResponse під WSGI, async-потік блоків під ASGI).
+    Ширини колонок задаються заздалегідь (write-only не дозволяє міряти клітинки після запису).
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.append(list(headers))
+    for row in rows:
+        ws.append(list(row))
+
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    wb.save(tmp)
+    size = tmp.tell()
+    tmp.seek(0)
+
+    if not isinstance(request, ASGIRequest):
+        return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+    response = StreamingHttpResponse(
+        _streaming_content(request, _file_blocks(tmp), 1),
+        content_type=XLSX_CONTENT_TYPE,
+    )
+    response["Content-Length"] = str(size)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -2,84 +2,182 @@
 import time
 import hmac
 import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.http import HttpResponse
 
+from backend.core.redis_client import REDIS_ERRORS, get_async_redis, get_redis
+
+logger = logging.getLogger("backend.core")
+
 
 def _bad(reason: str, status=401):
     # Прозоро пояснюємо причину у DEBUG, у проді — мінімум деталей.
+    logger.warning("AUTH FAIL: %s", reason)
     if settings.DEBUG:
         return HttpResponse(f"Unauthorized: {reason}", status=status)
     return HttpResponse("Unauthorized", status=status)
 
 
-class HMACAuthMiddleware:
+class NonceStore:
+    """
+    Одноразові X-Nonce у межах вікна підпису (повтор того самого запиту → 401).
+    Redis: SET NX EX — спільно для всіх воркерів; без Redis — обмежений LRU-словник у пам'яті процесу.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memory_add(self, nonce: str, ttl: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            # записи йдуть у порядку вставки з однаковим TTL — прострочені завжди на початку
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+            if nonce in self._seen:
+                return False
+            self._seen[nonce] = now + ttl
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+        return True
+
+    def add(self, nonce: str, ttl: int) -> bool:
+        """True — nonce новий (і тепер запам'ятований); False — повтор."""
+        client = get_redis()
+        if client is not None:
+            try:
+                return bool(client.set(f"hmac:nonce:{nonce}", 1, nx=True, ex=ttl))
+            except REDIS_ERRORS:
+                logger.warning("Nonce store: Redis unavailable, using in-process store")
+        return self._memory_add(nonce, ttl)
+
+    async def aadd(self, nonce: str, ttl: int) -> bool:
+        client = get_async_redis()
+        if client is not None:
+            try:
+                return bool(await client.set(f"hmac:nonce:{nonce}", 1, nx=True, ex=ttl))
+            except REDIS_ERRORS:
+                logger.warning("Nonce store: Redis unavailable, using in-process store")
+        return self._memory_add(nonce, ttl)
+
+
+nonce_store = NonceStore()
+
+
+def _check_signature(request, *, check_api_key: bool = True) -> str | None:
     """
-    Перевіряє для всіх шляхів, що починаються з /api/:
+    Перевірка без стану: None — підпис правильний, інакше причина відмови.
       1) X-API-Key == settings.DJANGO_API_KEY
       2) X-Timestamp у межах TTL
-      3) X-Signature (HMAC-SHA256) правильний
-         для рядка: "<ts>\n<METHOD>\n<full_path>\n<sha256(body)>"
+      3) X-Signature (HMAC-SHA256) для рядка "<ts>\n<METHOD>\n<full_path>\n<sha256(body)>[\n<nonce>]"
       4) (необов'язково) X-Content-SHA256 збігається з реальним body hash
     """
+    if check_api_key:
+        api_key = getattr(settings, "DJANGO_API_KEY", "")
+        if not api_key or request.headers.get("X-API-Key", "") != api_key:
+            return "bad api key"
+
+    ts = request.headers.get("X-Timestamp")
+    if not ts:
+        return "missing timestamp"
+    try:
+        ts_int = int(ts)
+    except ValueError:
+        return "invalid timestamp"
+    if abs(int(time.time()) - ts_int) > int(getattr(settings, "DJANGO_HMAC_TTL", 120)):
+        return "stale timestamp/replay"
+
+    nonce = request.headers.get("X-Nonce", "")
+    if nonce and not (8 <= len(nonce) <= 128):
+        return "invalid nonce"
+    if not nonce and getattr(settings, "DJANGO_HMAC_REQUIRE_NONCE", False):
+        return "missing nonce"
+
+    # Django кешує body, безпечно читати
+    body_sha256 = hashlib.sha256(request.body).hexdigest()
+    content_hdr = request.headers.get("X-Content-SHA256")
+    if content_hdr and content_hdr != body_sha256:
+        return "mismatched body hash"
+
+    # ВАЖЛИВО: підписуємо full_path (шлях + query), а не лише шлях
+    parts = [ts, request.method.upper(), request.get_full_path(), body_sha256]
+    if nonce:
+        parts.append(nonce)
+    expected = hmac.new(
+        getattr(settings, "DJANGO_HMAC_SECRET", "").encode("utf-8"),
+        "\n".join(parts).encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+    sig = request.headers.get("X-Signature", "")
+    # приймаємо як "v1=<hex>", так і чистий hex
+    if sig.startswith("v1="):
+        sig = sig[3:]
+    if not hmac.compare_digest(expected, sig):
+        return "bad signature"
+    return None
+
+
+def _nonce_ttl() -> int:
+    # timestamp приймається в межах ±TTL — стільки ж і пам'ятаємо nonce
+    return 2 * int(getattr(settings, "DJANGO_HMAC_TTL", 120))
+
+
+def authenticate(request, *, check_api_key: bool = True) -> str | None:
+    """Повна перевірка (підпис + nonce); успіх з перевіреним API-ключем позначає request.hmac_verified."""
+    reason = _check_signature(request, check_api_key=check_api_key)
+    if reason is None:
+        nonce = request.headers.get("X-Nonce")
+        if nonce and not nonce_store.add(nonce, _nonce_ttl()):
+            reason = "replayed nonce"
+    if reason is None and check_api_key:
+        request.hmac_verified = True
+    return reason
+
+
+async def aauthenticate(request, *, check_api_key: bool = True) -> str | None:
+    reason = _check_signature(request, check_api_key=check_api_key)
+    if reason is None:
+        nonce = request.headers.get("X-Nonce")
+        if nonce and not await nonce_store.aadd(nonce, _nonce_ttl()):
+            reason = "replayed nonce"
+    if reason is None and check_api_key:
+        request.hmac_verified = True
+    return reason
+
+
+class HMACAuthMiddleware:
+    """
+    Єдиний шар автентифікації для всіх шляхів, що починаються з /api/ (див. _check_signature),
+    плюс захист від повтору через X-Nonce. Результат — request.hmac_verified = True,
+    тож декоратори backend.core.security повторно нічого не хешують.
+    Працює і під WSGI, і під ASGI: тіло запиту вже прочитане хендлером.
+    """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.api_key = getattr(settings, "DJANGO_API_KEY", "")
-        self.hmac_secret = getattr(settings, "DJANGO_HMAC_SECRET", "")
-        self.ttl = int(getattr(settings, "DJANGO_HMAC_TTL", 120))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Захищаємо тільки API-ендпоїнти
-        if not request.path.startswith("/api/"):
-            return self.get_response(request)
-
-        # 1) API key
-        api_key = request.headers.get("X-API-Key", "")
-        if not self.api_key or api_key != self.api_key:
-            return _bad("bad api key")
-
-        # 2) Timestamp
-        ts = request.headers.get("X-Timestamp")
-        if not ts:
-            return _bad("missing timestamp")
-
-        try:
-            ts_int = int(ts)
-        except ValueError:
-            return _bad("invalid timestamp")
-
-        now = int(time.time())
-        if abs(now - ts_int) > self.ttl:
-            return _bad("stale timestamp/replay")
-
-        # 3) Обчислюємо реальний hash body
-        body_bytes = request.body  # Django кешує, безпечно читати
-        body_sha256 = hashlib.sha256(body_bytes).hexdigest()
-
-        # якщо клієнт надіслав X-Content-SHA256 — звіримося
-        content_hdr = request.headers.get("X-Content-SHA256")
-        if content_hdr and content_hdr != body_sha256:
-            return _bad("mismatched body hash")
-
-        method = request.method.upper()
-        # ВАЖЛИВО: підписуємо full_path (шлях + query), а не лише шлях
-        full_path = request.get_full_path()
-
-        to_sign = "\n".join([ts, method, full_path, body_sha256]).encode("utf-8")
-        expected = hmac.new(
-            self.hmac_secret.encode("utf-8"),
-            to_sign,
-            hashlib.sha256
-        ).hexdigest()
-
-        sig = request.headers.get("X-Signature", "")
-        # приймаємо як "v1=<hex>", так і чистий hex
-        if sig.startswith("v1="):
-            sig = sig[3:]
-
-        if not hmac.compare_digest(expected, sig):
-            return _bad("bad signature")
-
-        # все гаразд
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path.startswith("/api/"):
+            reason = authenticate(request)
+            if reason is not None:
+                return _bad(reason)
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path.startswith("/api/"):
+            reason = await aauthenticate(request)
+            if reason is not None:
+                return _bad(reason)
+        return await self.get_response(request)
@@ -1,17 +1,23 @@
 # backend/core/ratelimit.py
+import math
+import threading
 import time
 import logging
+import uuid
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import JsonResponse
 
-logger = logging.getLogger(__name__)
+from backend.core.redis_client import REDIS_ERRORS, get_async_redis, get_redis
 
-# 1 запит / 10 секунд
-RATE_LIMIT_SECONDS = 10
+logger = logging.getLogger(__name__)
 
-# Лімітуємо лише ці шляхи (і лише для зазначених методів)
-LIMITED_PATHS = {
-    ("/api/search/", frozenset({"POST"})),
-    ("/api/feedback/", frozenset({"POST"})),
+# Ліміти за замовчуванням (перекриваються settings.RATE_LIMITS): 1 запит / 10 секунд
+DEFAULT_RATE_LIMITS = {
+    "/api/search/": {"methods": ["POST"], "limit": 1, "window": 10},
+    "/api/feedback/": {"methods": ["POST"], "limit": 1, "window": 10},
 }
 
 # Виключення (не лімітуємо)
@@ -19,56 +25,175 @@ EXCLUDED_PATHS = {
     "/api/ping/",
 }
 
-# Пам’ять у процесі: {(key, path): last_ts}
-_last_request: dict[tuple[str, str], float] = {}
+# Ковзне вікно в Redis одним атомарним скриптом: ZSET з мітками часу запитів на ключ.
+# Повертає 0, якщо запит пропущено, інакше — скільки мс чекати до звільнення місця у вікні.
+_SLIDING_WINDOW_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+  redis.call('ZADD', KEYS[1], now, ARGV[3])
+  redis.call('PEXPIRE', KEYS[1], window)
+  return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return math.max(tonumber(oldest[2]) + window - now, 1)
+"""
+
+
+class MemoryRateLimiter:
+    """
+    Ковзне вікно в пам'яті процесу (fallback без Redis): ліміт діє на кожен воркер окремо.
+    Ключі, чиє вікно вже минуло, періодично видаляються — словник не росте необмежено.
+    """
+
+    SWEEP_SECONDS = 60
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits: dict[str, tuple[deque, float]] = {}  # key -> (мітки часу, коли ключ можна забути)
+        self._next_sweep = 0.0
 
-def _rate_limit_applies(path: str, method: str) -> bool:
+    def hit(self, key: str, limit: int, window: float) -> float:
+        """0 — запит пропущено; інакше скільки секунд чекати."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                for stale in [k for k, (_, expires_at) in self._hits.items() if expires_at <= now]:
+                    del self._hits[stale]
+                self._next_sweep = now + self.SWEEP_SECONDS
+
+            stamps = self._hits.get(key, (deque(), 0.0))[0]
+            while stamps and stamps[0] <= now - window:
+                stamps.popleft()
+            if len(stamps) >= limit:
+                self._hits[key] = (stamps, stamps[-1] + window)
+                return stamps[0] + window - now
+            stamps.append(now)
+            self._hits[key] = (stamps, now + window)
+            return 0.0
+
+    async def ahit(self, key: str, limit: int, window: float) -> float:
+        return self.hit(key, limit, window)
+
+
+class RedisRateLimiter:
+    """Спільний для всіх воркерів ліміт у Redis; якщо Redis недоступний — MemoryRateLimiter."""
+
+    def __init__(self, fallback: MemoryRateLimiter):
+        self.fallback = fallback
+
+    @staticmethod
+    def _args(limit: int, window: float):
+        return [int(window * 1000), limit, uuid.uuid4().hex]
+
+    def hit(self, key: str, limit: int, window: float) -> float:
+        client = get_redis()
+        if client is None:
+            return self.fallback.hit(key, limit, window)
+        try:
+            wait_ms = client.register_script(_SLIDING_WINDOW_LUA)(keys=[key], args=self._args(limit, window))
+        except REDIS_ERRORS as exc:
+            logger.warning("Rate limiter: Redis unavailable (%s), using in-process limits", exc)
+            return self.fallback.hit(key, limit, window)
+        return int(wait_ms) / 1000
+
+    async def ahit(self, key: str, limit: int, window: float) -> float:
+        client = get_async_redis()
+        if client is None:
+            return self.fallback.hit(key, limit, window)
+        try:
+            script = client.register_script(_SLIDING_WINDOW_LUA)
+            wait_ms = await script(keys=[key], args=self._args(limit, window))
+        except REDIS_ERRORS as exc:
+            logger.warning("Rate limiter: Redis unavailable (%s), using in-process limits", exc)
+            return self.fallback.hit(key, limit, window)
+        return int(wait_ms) / 1000
+
+
+_memory_limiter = MemoryRateLimiter()
+_BACKENDS = {
+    "memory": _memory_limiter,
+    "redis": RedisRateLimiter(_memory_limiter),
+}
+
+
+def _rate_limit_rule(path: str, method: str):
+    """Правило з settings.RATE_LIMITS для шляху/методу або None."""
     if path in EXCLUDED_PATHS:
-        return False
-    for limited_path, methods in LIMITED_PATHS:
-        if path == limited_path and method.upper() in methods:
-            return True
-    return False
+        return None
+    rule = getattr(settings, "RATE_LIMITS", DEFAULT_RATE_LIMITS).get(path)
+    if rule is None:
+        return None
+    methods = {m.upper() for m in rule.get("methods", ())}
+    if methods and method.upper() not in methods:
+        return None
+    return rule
 
 
 class RateLimitMiddleware:
     """
-    Синхронний middleware з лімітом “1 запит / 10 сек” на користувача і шлях.
+    Middleware з лімітом “limit запитів / window сек” (settings.RATE_LIMITS) на користувача і шлях.
     Ключ користувача: X-Telegram-Id, а якщо немає — REMOTE_ADDR.
+    Бекенд — settings.RATE_LIMIT_BACKEND: "redis" (спільний для всіх воркерів) або "memory".
+    Працює і під WSGI, і під ASGI (без переходу в thread-пул на async-ланцюжку).
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.limiter = _BACKENDS[getattr(settings, "RATE_LIMIT_BACKEND", "redis")]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        path = request.path
-        method = request.method.upper()
-
-        if not _rate_limit_applies(path, method):
-            return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = None
+        check = self._prepare(request)
+        if check is not None:
+            response = self._verdict(check, self.limiter.hit(*check[1:]))
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = None
+        check = self._prepare(request)
+        if check is not None:
+            response = self._verdict(check, await self.limiter.ahit(*check[1:]))
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def _prepare(self, request):
+        """None — шлях не лімітується; інакше (user_id, key, limit, window)."""
+        rule = _rate_limit_rule(request.path, request.method)
+        if rule is None:
+            return None
 
         user_id = request.headers.get("X-Telegram-Id")
         if not user_id:
             user_id = request.META.get("REMOTE_ADDR", "anonymous")
-
-        now = time.monotonic()
-        key = (str(user_id), path)
-        last = _last_request.get(key, 0.0)
-        delta = now - last
-
-        if delta < RATE_LIMIT_SECONDS:
-            retry_after = max(int(RATE_LIMIT_SECONDS - delta), 1)
-            logger.warning(f"Rate limit exceeded for user={user_id} path={path}")
-            resp = JsonResponse(
-                {
-                    "error": "too_many_requests",
-                    "detail": f"Дочекайтеся {retry_after} сек перед новим запитом",
-                },
-                status=429,
-            )
-            resp["Retry-After"] = str(retry_after)
-            return resp
-
-        _last_request[key] = now
-        return self.get_response(request)
+        key = f"rl:{user_id}:{request.path}"
+        return str(user_id), key, int(rule.get("limit", 1)), float(rule.get("window", 10))
+
+    def _verdict(self, check, wait: float):
+        """None — пропускаємо далі; інакше готова відповідь 429."""
+        if wait <= 0:
+            return None
+        user_id, key = check[0], check[1]
+        retry_after = max(math.ceil(wait), 1)
+        logger.warning(f"Rate limit exceeded for user={user_id} key={key}")
+        resp = JsonResponse(
+            {
+                "error": "too_many_requests",
+                "detail": f"Дочекайтеся {retry_after} сек перед новим запитом",
+            },
+            status=429,
+        )
+        resp["Retry-After"] = str(retry_after)
+        return resp
@@ -0,0 +1,87 @@
+# backend/core/redis_client.py
+import asyncio
+import logging
+import weakref
+from django.conf import settings
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # redis — опційна залежність: без неї працюємо лише з in-process кешами
+    redis = None
+    aioredis = None
+
+logger = logging.getLogger("backend.core")
+
+# Помилки, які викликаючий код має ковтати, деградуючи до локального режиму
+REDIS_ERRORS = (redis.RedisError,) if redis is not None else ()
+
+_client = None
+# async-клієнт (і його пул) прив'язаний до event loop: loop -> (клієнт, сторож закриття)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+async def _close_on_shutdown(aclose):
+    try:
+        yield
+    finally:
+        try:
+            await aclose()
+        except Exception:
+            logger.debug("Closing loop-bound client failed", exc_info=True)
+
+
+def close_on_loop_shutdown(loop, aclose):
+    """
+    Закриває ресурс, прив'язаний до loop, коли цей loop завершується.
+    Під WSGI async-view виконуються через async_to_sync — новий loop на кожен запит; він, як і
+    asyncio.run(), перед закриттям викликає loop.shutdown_asyncgens(), що aclose()-ить незавершені
+    async-генератори. Генератор-«сторож» із finally закриває клієнт разом із loop, тож пули
+    з'єднань не накопичуються до GC. Під ASGI loop живе весь час роботи воркера.
+    Повертає сторожа — його треба тримати поруч із клієнтом (loop посилається на генератори слабко).
+    """
+    guard = _close_on_shutdown(aclose)
+    asyncio.ensure_future(guard.__anext__(), loop=loop)
+    return guard
+
+
+def get_redis():
+    """
+    Спільний (на процес) sync-клієнт Redis із пулом з'єднань.
+    Повертає None, якщо REDIS_URL не задано або пакет redis не встановлено.
+    """
+    global _client
+    url = getattr(settings, "REDIS_URL", "")
+    if not url or redis is None:
+        return None
+    if _client is None:
+        timeout = float(getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5))
+        _client = redis.Redis.from_url(
+            url,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            health_check_interval=30,
+        )
+        logger.info("Redis client initialised")
+    return _client
+
+
+def get_async_redis():
+    """Async-клієнт Redis для поточного event loop або None (див. get_redis)."""
+    url = getattr(settings, "REDIS_URL", "")
+    if not url or aioredis is None:
+        return None
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None:
+        timeout = float(getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5))
+        client = aioredis.Redis.from_url(
+            url,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            health_check_interval=30,
+        )
+        aclose = getattr(client, "aclose", None) or client.close  # aclose() — redis-py >= 5.0.1
+        state = (client, close_on_loop_shutdown(loop, aclose))
+        _async_clients[loop] = state
+    return state[0]
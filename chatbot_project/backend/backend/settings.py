@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR.parent / ".env")
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'pgvector.django',
 
     'qa_app',
@@ -35,7 +37,7 @@ INSTALLED_APPS = [
 # --- Middleware ---
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'backend.core.static.WhiteNoiseMiddleware',
 
     'backend.core.sec_headers.SecurityHeadersMiddleware',
     'backend.core.ratelimit.RateLimitMiddleware',
@@ -120,9 +122,51 @@ LOGGING = {
     },
 }
 
+# --- Redis (спільний кеш між воркерами; порожній REDIS_URL = лише in-process кеші) ---
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+# Django cache (каталог інструкцій тощо): спільний Redis, якщо він є, інакше — пам'ять процесу
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "chatbot",
+            "OPTIONS": {
+                "socket_timeout": REDIS_SOCKET_TIMEOUT,
+                "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+            },
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# --- Кеш рішень require_telegram_access (сек): у Redis і локально у воркері (коротше, якщо є Redis) ---
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_LOCAL_CACHE_TTL = int(os.getenv("AUTH_LOCAL_CACHE_TTL", "5"))
+
+# --- Rate limit (backend.core.ratelimit): ковзне вікно на користувача і шлях ---
+# "redis" — спільний ліміт для всіх воркерів (без Redis — автоматично "memory"), "memory" — на процес
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis")
+RATE_LIMITS = {
+    "/api/search/": {
+        "methods": ["POST"],
+        "limit": int(os.getenv("RATE_LIMIT_SEARCH", "1")),
+        "window": float(os.getenv("RATE_LIMIT_SEARCH_WINDOW", "10")),
+    },
+    "/api/feedback/": {
+        "methods": ["POST"],
+        "limit": int(os.getenv("RATE_LIMIT_FEEDBACK", "1")),
+        "window": float(os.getenv("RATE_LIMIT_FEEDBACK_WINDOW", "10")),
+    },
+}
+
 DJANGO_API_KEY = os.getenv("DJANGO_API_KEY", "")
 DJANGO_HMAC_SECRET = os.getenv("DJANGO_HMAC_SECRET", "")
 DJANGO_HMAC_TTL = int(os.getenv("DJANGO_HMAC_TTL", "120"))
+# X-Nonce (одноразовий, входить у підпис) — обов'язковий для всіх клієнтів; False — лише якщо надіслано
+DJANGO_HMAC_REQUIRE_NONCE = os.getenv("DJANGO_HMAC_REQUIRE_NONCE", "False").lower() == "true"
 
 # --- HTTPS/Безпека ---
 # Зовнішній HTTPS завершує Nginx; внутрішні сервіси ходять по http без редіректів.
@@ -144,4 +188,59 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "5"))
 SEARCH_SIM_THRESHOLD = float(os.getenv("SEARCH_SIM_THRESHOLD", "0.35"))
+# multi-answer режим /api/search/ ("limit" у тілі): максимум записів і нижній поріг для підказок
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "5"))
+SEARCH_SUGGEST_THRESHOLD = float(os.getenv("SEARCH_SUGGEST_THRESHOLD", "0.2"))
+# підказки потрібні саме тоді, коли відповідь не знайдена (усі кандидати < SEARCH_SIM_THRESHOLD)
+if SEARCH_SUGGEST_THRESHOLD >= SEARCH_SIM_THRESHOLD:
+    raise ImproperlyConfigured("SEARCH_SUGGEST_THRESHOLD must be lower than SEARCH_SIM_THRESHOLD")
 EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", "1536"))
+# "pg" — пошук у Postgres; "memory" — in-process NumPy індекс у кожному воркері
+SEARCH_VECTOR_BACKEND = os.getenv("SEARCH_VECTOR_BACKEND", "pg")
+# як часто (сек) memory-індекс перевіряє, чи не змінили варіанти інші воркери
+SEARCH_INDEX_CHECK_SECONDS = float(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "30"))
+# точність ANN-індексу pgvector на запит (HNSW / IVFFlat)
+SEARCH_HNSW_EF_SEARCH = int(os.getenv("SEARCH_HNSW_EF_SEARCH", "40"))
+SEARCH_IVFFLAT_PROBES = int(os.getenv("SEARCH_IVFFLAT_PROBES", "10"))
+# "vector" — лише embeddings; "hybrid" — BM25 (rank-bm25) + вектор через Reciprocal Rank Fusion
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# у hybrid: лексична впевненість (0..1), з якої відповідаємо без виклику embeddings; 0 — вимкнено
+SEARCH_LEXICAL_SHORTCUT = float(os.getenv("SEARCH_LEXICAL_SHORTCUT", "0.9"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+# пошук інструкцій (Postgres FTS): конфіг text search і пагінація /api/search_instructions/
+INSTRUCTION_SEARCH_CONFIG = os.getenv("INSTRUCTION_SEARCH_CONFIG", "simple")
+INSTRUCTION_SEARCH_PAGE_SIZE = int(os.getenv("INSTRUCTION_SEARCH_PAGE_SIZE", "20"))
+INSTRUCTION_SEARCH_MAX_PAGE_SIZE = int(os.getenv("INSTRUCTION_SEARCH_MAX_PAGE_SIZE", "50"))
+# "semantic" — за змістом (InstructionChunk + HNSW, з відкатом на FTS), "fulltext" — лише Postgres FTS
+INSTRUCTION_SEARCH_MODE = os.getenv("INSTRUCTION_SEARCH_MODE", "semantic")
+# розмір фрагмента інструкції для embeddings (символів) і мінімальна косинусна схожість у видачі
+INSTRUCTION_CHUNK_CHARS = int(os.getenv("INSTRUCTION_CHUNK_CHARS", "800"))
+INSTRUCTION_SEMANTIC_THRESHOLD = float(os.getenv("INSTRUCTION_SEMANTIC_THRESHOLD", "0.3"))
+# дерево категорія → підкатегорія → інструкції (/api/catalogue/): скільки жити в кеші без змін в адмінці
+CATALOGUE_CACHE_TTL = int(os.getenv("CATALOGUE_CACHE_TTL", "3600"))
+# зображення інструкцій при завантаженні: максимальна сторона (px) і бажаний розмір JPEG (KB)
+INSTRUCTION_IMAGE_MAX_SIDE = int(os.getenv("INSTRUCTION_IMAGE_MAX_SIDE", "1280"))
+INSTRUCTION_IMAGE_TARGET_KB = int(os.getenv("INSTRUCTION_IMAGE_TARGET_KB", "300"))
+# кеш embedding-ів запитів: розмір LRU у процесі та TTL у Redis (сек)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", str(30 * 24 * 3600)))
+
+# --- Фонові embedding-задачі (manage.py embedding_worker) ---
+# False — рахувати одразу після коміту в процесі, що зберіг запис (зручно для розробки без воркера)
+EMBEDDING_JOBS_ASYNC = os.getenv("EMBEDDING_JOBS_ASYNC", "True").lower() == "true"
+EMBEDDING_JOB_HANDLERS = [
+    "qa_app.services.embedding_jobs.process_pending",
+    "instructions_app.services.semantic.process_pending",
+]
+EMBEDDING_JOB_CLAIM_TIMEOUT = int(os.getenv("EMBEDDING_JOB_CLAIM_TIMEOUT", "600"))
+EMBEDDING_JOB_RETRY_SECONDS = int(os.getenv("EMBEDDING_JOB_RETRY_SECONDS", "60"))
+# журнал запитів (QuestionLog / UnansweredQuestion) пишеться у фоні пакетами: розмір пакета і інтервал (сек)
+QUESTION_LOG_ASYNC = os.getenv("QUESTION_LOG_ASYNC", "True").lower() == "true"
+QUESTION_LOG_BATCH = int(os.getenv("QUESTION_LOG_BATCH", "100"))
+QUESTION_LOG_FLUSH_SECONDS = float(os.getenv("QUESTION_LOG_FLUSH_SECONDS", "2"))
+# QuestionLog секціоновано помісячно: скільки місяців сирих логів тримати і на скільки місяців наперед
+# створювати секції (prune_question_logs); денні зведення (rollup_question_logs) зберігаються без обмежень
+QUESTION_LOG_RETENTION_MONTHS = int(os.getenv("QUESTION_LOG_RETENTION_MONTHS", "12"))
+QUESTION_LOG_PARTITIONS_AHEAD = int(os.getenv("QUESTION_LOG_PARTITIONS_AHEAD", "2"))
+# експорт з адмінки (Excel/CSV): скільки рядків читати з БД за раз
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
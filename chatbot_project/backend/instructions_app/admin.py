@@ -18,8 +18,8 @@ class InstructionSubcategoryAdmin(AuditedModelAdmin):
 
 @admin.register(Instruction)
 class InstructionAdmin(AuditedModelAdmin):
-    list_display = ('title', 'subcategory')
-    list_filter = ('subcategory',)
+    list_display = ('title', 'subcategory', 'embedding_status')
+    list_filter = ('subcategory', 'embedding_status')
     search_fields = ('title', 'content')
     filter_horizontal = ('tags',)
 
@@ -5,3 +5,6 @@ class InstructionsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'instructions_app'
     verbose_name = "Інструкції"
+
+    def ready(self):
+        from instructions_app import signals  # noqa: F401
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger("instructions_app")
+
+# Telegram стискає фото до ~1280 px по більшій стороні — більше зберігати й віддавати немає сенсу
+MAX_SIDE = getattr(settings, "INSTRUCTION_IMAGE_MAX_SIDE", 1280)
+# якість JPEG від кращої до гіршої: беремо першу, що вкладається в TARGET_BYTES
+QUALITY_TIERS = (85, 75, 65)
+TARGET_BYTES = getattr(settings, "INSTRUCTION_IMAGE_TARGET_KB", 300) * 1024
+
+
+def hashed_name(data: bytes) -> str:
+    """Ім'я від вмісту: той самий файл — те саме ім'я, тож nginx може кешувати його назавжди."""
+    return f"{hashlib.sha256(data).hexdigest()[:16]}.jpg"
+
+
+def optimize_image(file) -> ContentFile | None:
+    """
+    Поворот за EXIF, зменшення до MAX_SIDE, JPEG (прозорість — на білому тлі) без метаданих.
+    Формат — JPEG, а не WebP: sendPhoto у Telegram приймає WebP лише як стікер/документ.
+    Повертає ContentFile з content-hash ім'ям або None, якщо файл не вдалося прочитати як зображення.
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as source:
+            image = ImageOps.exif_transpose(source)
+            image.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+
+            data = b""
+            for quality in QUALITY_TIERS:
+                buffer = io.BytesIO()
+                # без exif=/icc_profile= Pillow не переносить метадані джерела
+                image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+                data = buffer.getvalue()
+                if len(data) <= TARGET_BYTES:
+                    break
+    except (UnidentifiedImageError, OSError) as exc:
+        logger.warning("Instruction image left as uploaded: %s", exc)
+        return None
+
+    return ContentFile(data, name=hashed_name(data))
@@ -0,0 +1,47 @@
+import os
+import re
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from instructions_app.models import Instruction
+
+# вже оброблені файли мають ім'я <16 hex>.jpg (можливо з суфіксом storage)
+_OPTIMIZED_RE = re.compile(r"^[0-9a-f]{16}(_\w+)?\.jpg$")
+
+
+class Command(BaseCommand):
+    help = "Run already uploaded Instruction images through the save-time pipeline (resize, JPEG, no metadata)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-old", action="store_true", help="Do not delete the original files from storage")
+
+    def handle(self, *args, **options):
+        done = skipped = saved_bytes = 0
+        for instruction in Instruction.objects.exclude(image="").exclude(image__isnull=True).iterator(chunk_size=100):
+            old_name = instruction.image.name
+            if _OPTIMIZED_RE.match(os.path.basename(old_name)):
+                skipped += 1
+                continue
+            storage = instruction.image.storage
+            try:
+                with instruction.image.open("rb") as fh:
+                    data = fh.read()
+            except OSError as exc:
+                self.stderr.write(f"id={instruction.pk}: cannot read {old_name}: {exc}")
+                continue
+
+            # незакомічений файл → Instruction.save() пропустить його через optimize_image
+            instruction.image = ContentFile(data, name=os.path.basename(old_name))
+            instruction.save(update_fields=["image"])
+            if instruction.image.name == old_name or not _OPTIMIZED_RE.match(os.path.basename(instruction.image.name)):
+                skipped += 1
+                continue
+            saved_bytes += len(data) - instruction.image.size
+            if not options["keep_old"]:
+                storage.delete(old_name)
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Optimized {done} images ({saved_bytes / 1024:.0f} KiB saved), skipped {skipped}."
+        ))
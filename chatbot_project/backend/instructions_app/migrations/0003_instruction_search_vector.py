@@ -0,0 +1,54 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_search_vector(apps, schema_editor):
+    # вираз скопійовано з instructions_app.services.fulltext.search_vector_expression на момент міграції —
+    # історична міграція не повинна залежати від живого коду сервісу
+    from django.conf import settings
+
+    Instruction = apps.get_model('instructions_app', 'Instruction')
+    Tag = apps.get_model('instructions_app', 'Tag')
+    config = getattr(settings, 'INSTRUCTION_SEARCH_CONFIG', 'simple')
+    tag_names = (
+        Tag.objects.filter(instructions=OuterRef('pk'))
+        .values('instructions')
+        .annotate(names=StringAgg('name', delimiter=' '))
+        .values('names')
+    )
+    Instruction.objects.update(search_vector=(
+        SearchVector('title', weight='A', config=config)
+        + SearchVector(Coalesce(Subquery(tag_names), Value('')), weight='A', config=config)
+        + SearchVector('content', weight='B', config=config)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instructions_app', '0002_tag_instruction_tags'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='instruction',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='instruction',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='instruction_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='instruction',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='instruction_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
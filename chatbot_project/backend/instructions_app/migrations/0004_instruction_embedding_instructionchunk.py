@@ -0,0 +1,46 @@
+import django.db.models.deletion
+import pgvector.django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instructions_app', '0003_instruction_search_vector'),
+        ('qa_app', '0000_enable_pgvector'),
+    ]
+
+    operations = [
+        # усі наявні інструкції стають pending — embedding_worker наріже й порахує їх у фоні
+        migrations.AddField(
+            model_name='instruction',
+            name='embedding_status',
+            field=models.CharField(choices=[('pending', 'Очікує'), ('processing', 'Обробляється'), ('ready', 'Готово'), ('failed', 'Помилка')], db_index=True, default='pending', editable=False, max_length=16, verbose_name='Embedding'),
+        ),
+        migrations.AddField(
+            model_name='instruction',
+            name='embedding_status_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='instruction',
+            name='embedding_fingerprint',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='InstructionChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=1536)),
+                ('instruction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='instructions_app.instruction')),
+            ],
+            options={
+                'verbose_name': 'Фрагмент інструкції',
+                'verbose_name_plural': 'Фрагменти інструкцій',
+                'ordering': ('instruction', 'position'),
+                'indexes': [pgvector.django.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='instruction_chunk_hnsw', opclasses=['vector_cosine_ops'])],
+            },
+        ),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from pgvector.django import HnswIndex, VectorField
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -31,15 +36,85 @@ class InstructionSubcategory(models.Model):
 
 
 class Instruction(models.Model):
+    class EmbeddingStatus(models.TextChoices):
+        # ті самі значення, що й QAEntry.EmbeddingStatus — спільна черга qa_app.services.embedding_jobs
+        PENDING = "pending", "Очікує"
+        PROCESSING = "processing", "Обробляється"
+        READY = "ready", "Готово"
+        FAILED = "failed", "Помилка"
+
     subcategory = models.ForeignKey(InstructionSubcategory, on_delete=models.CASCADE, related_name='instructions')
     title = models.CharField("Назва інструкції", max_length=200)
     content = models.TextField("Текст інструкції")
     image = models.ImageField("Зображення", upload_to='instructions/', blank=True, null=True)
     tags = models.ManyToManyField('Tag', related_name='instructions', blank=True)  # Додати цей рядок
+    # tsvector(title + теги + content); оновлюється сигналами (instructions_app/signals.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # семантичний пошук: фрагменти з embedding-ами рахує фоновий воркер (InstructionChunk)
+    embedding_status = models.CharField(
+        "Embedding", max_length=16, choices=EmbeddingStatus.choices,
+        default=EmbeddingStatus.PENDING, db_index=True, editable=False,
+    )
+    embedding_status_at = models.DateTimeField(null=True, blank=True, editable=False)
+    embedding_fingerprint = models.CharField(max_length=64, default="", editable=False)
 
     class Meta:
         verbose_name = "Інструкція"
         verbose_name_plural = "Інструкції"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='instruction_search_gin'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='instruction_title_trgm'),
+        ]
 
     def __str__(self):
         return self.title
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        """
+        Нове зображення проходить instructions_app.images.optimize_image (розмір, JPEG, без метаданих).
+        Зміна title/content ставить інструкцію в чергу на перерахунок фрагментів (embedding_worker).
+        Мережевих викликів у запиті немає; незмінений текст воркер розпізнає за fingerprint.
+        """
+        # нове завантаження (ще не записане в storage) — стискаємо до збереження
+        if self.image and not self.image._committed:
+            from instructions_app.images import optimize_image
+
+            optimized = optimize_image(self.image)
+            if optimized is not None:
+                self.image = optimized
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"title", "content"} & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        from instructions_app.services.semantic import enqueue_instruction
+
+        self.embedding_status = self.EmbeddingStatus.PENDING
+        self.embedding_status_at = timezone.now()
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"embedding_status", "embedding_status_at"}
+        super().save(*args, **kwargs)
+        enqueue_instruction(self.pk)
+
+
+class InstructionChunk(models.Model):
+    """Фрагмент інструкції (заголовок + абзаци до INSTRUCTION_CHUNK_CHARS символів) з embedding."""
+    instruction = models.ForeignKey(Instruction, on_delete=models.CASCADE, related_name='chunks')
+    position = models.PositiveIntegerField()
+    text = models.TextField()
+    embedding = VectorField(dimensions=getattr(settings, "EMBED_DIMENSIONS", 1536))
+
+    class Meta:
+        verbose_name = "Фрагмент інструкції"
+        verbose_name_plural = "Фрагменти інструкцій"
+        ordering = ('instruction', 'position')
+        indexes = [
+            HnswIndex(
+                name='instruction_chunk_hnsw', fields=['embedding'],
+                m=16, ef_construction=64, opclasses=['vector_cosine_ops'],
+            ),
+        ]
+
+    def __str__(self):
+        return f"[{self.instruction_id}#{self.position}] {self.text[:50]}"
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from backend.core.redis_client import REDIS_ERRORS
+from instructions_app.models import Instruction, InstructionCategory, InstructionSubcategory
+
+logger = logging.getLogger("instructions_app")
+
+CACHE_KEY = "instructions:catalogue:v1"
+DETAIL_CACHE_KEY = "instructions:detail:v1:{id}"
+
+
+def build_catalogue() -> list[dict]:
+    """Дерево категорія → підкатегорія → інструкції (id, title): три запити через prefetch_related."""
+    categories = InstructionCategory.objects.order_by("id").prefetch_related(
+        Prefetch(
+            "subcategories",
+            queryset=InstructionSubcategory.objects.order_by("id").prefetch_related(
+                Prefetch("instructions", queryset=Instruction.objects.order_by("id").only("id", "title", "subcategory_id"))
+            ),
+        )
+    )
+    return [
+        {
+            "id": c.id,
+            "name": c.name,
+            "subcategories": [
+                {
+                    "id": s.id,
+                    "name": s.name,
+                    "instructions": [{"id": i.id, "title": i.title} for i in s.instructions.all()],
+                }
+                for s in c.subcategories.all()
+            ],
+        }
+        for c in categories
+    ]
+
+
+def build_instruction_detail(instruction_id: int) -> dict | None:
+    instruction = Instruction.objects.filter(pk=instruction_id).only("title", "content", "image").first()
+    if instruction is None:
+        return None
+    return {
+        "title": instruction.title,
+        "content": instruction.content,
+        "image_url": instruction.image.url if instruction.image else None,
+    }
+
+
+def _render(payload, prefix: str) -> dict:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # ETag від вмісту: однаковий у всіх воркерах і після витіснення з кешу
+    return {"etag": f'"{prefix}-{hashlib.sha256(body).hexdigest()[:32]}"', "body": body}
+
+
+async def _cached(key: str, build, prefix: str) -> dict | None:
+    """{"etag", "body"} з Django cache; при промаху будуємо і кладемо на CATALOGUE_CACHE_TTL (None не кешуємо)."""
+    try:
+        cached = await cache.aget(key)
+    except REDIS_ERRORS:
+        logger.warning("Catalogue cache unavailable, building without cache")
+        cached = None
+    if cached is not None:
+        return cached
+
+    payload = await sync_to_async(build)()
+    if payload is None:
+        return None
+    rendered = _render(payload, prefix)
+    try:
+        await cache.aset(key, rendered, getattr(settings, "CATALOGUE_CACHE_TTL", 3600))
+    except REDIS_ERRORS:
+        pass
+    return rendered
+
+
+async def get_catalogue() -> dict:
+    return await _cached(CACHE_KEY, build_catalogue, "cat")
+
+
+async def get_instruction_detail(instruction_id: int) -> dict | None:
+    return await _cached(
+        DETAIL_CACHE_KEY.format(id=instruction_id),
+        lambda: build_instruction_detail(instruction_id),
+        f"instr{instruction_id}",
+    )
+
+
+def invalidate_catalogue(instruction_id: int | None = None) -> None:
+    keys = [CACHE_KEY]
+    if instruction_id is not None:
+        keys.append(DETAIL_CACHE_KEY.format(id=instruction_id))
+    try:
+        cache.delete_many(keys)
+    except REDIS_ERRORS:
+        logger.warning("Catalogue cache invalidation failed")
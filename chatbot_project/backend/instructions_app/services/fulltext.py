@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from instructions_app.models import Instruction, Tag
+
+# українського словника в Postgres немає — "simple" (lowercase без стемінгу) поводиться передбачувано
+SEARCH_CONFIG = getattr(settings, "INSTRUCTION_SEARCH_CONFIG", "simple")
+
+
+def search_vector_expression():
+    """title (вага A) + теги (A) + content (B); міграція 0003 містить копію цього виразу для бекфілу."""
+    tag_names = (
+        Tag.objects.filter(instructions=OuterRef("pk"))
+        .values("instructions")
+        .annotate(names=StringAgg("name", delimiter=" "))
+        .values("names")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(tag_names), Value("")), weight="A", config=SEARCH_CONFIG)
+        + SearchVector("content", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(instruction_ids: Iterable[int]) -> None:
+    """Один UPDATE на пачку: tsvector рахує сам Postgres, без завантаження тексту в Python."""
+    ids = list(instruction_ids)
+    if ids:
+        Instruction.objects.filter(pk__in=ids).update(search_vector=search_vector_expression())
+
+
+def search_queryset(query: str):
+    """
+    Повнотекстовий пошук (GIN по search_vector) АБО схожість за триграмами в title
+    (GIN gin_trgm_ops — часткові слова й одруківки). Ранг: ts_rank + word_similarity.
+    """
+    ts_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    return (
+        Instruction.objects
+        .filter(Q(search_vector=ts_query) | Q(title__trigram_word_similar=query))
+        # search_vector може бути NULL (ще не заповнений) — тоді SearchRank NULL, а NULL у DESC іде першим
+        .annotate(rank=Coalesce(SearchRank(F("search_vector"), ts_query), Value(0.0))
+                  + TrigramWordSimilarity(query, "title"))
+        .order_by("-rank", "id")
+    )
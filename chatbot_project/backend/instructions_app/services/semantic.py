@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import re
+from typing import List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from pgvector.django import CosineDistance
+
+from instructions_app.models import Instruction, InstructionChunk
+from qa_app.services.embedding_jobs import claim_pending
+from qa_app.services.embeddings import embed_text_async, embed_texts_sync, texts_fingerprint
+from qa_app.services.vector_search import apply_ann_settings
+from qa_app.text_utils import normalize_text
+
+logger = logging.getLogger("instructions_app")
+
+Status = Instruction.EmbeddingStatus
+
+CHUNK_CHARS = getattr(settings, "INSTRUCTION_CHUNK_CHARS", 800)
+SIM_THRESHOLD = getattr(settings, "INSTRUCTION_SEMANTIC_THRESHOLD", 0.3)
+# скільки фрагментів беремо на одну інструкцію у видачі: решту місць займуть сусідні фрагменти тих самих інструкцій
+CHUNKS_PER_RESULT = 4
+
+
+# ---- нарізка
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    pieces = []
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        pieces.append(paragraph[:cut].strip())
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
+
+
+def split_passages(title: str, content: str, max_chars: int | None = None) -> List[str]:
+    """
+    Ділимо content на фрагменти до max_chars по абзацах (довгі абзаци — по словах)
+    і додаємо до кожного заголовок, щоб фрагмент мав контекст. Без тексту — лише заголовок.
+    """
+    max_chars = max_chars or CHUNK_CHARS
+    title = (title or "").strip()
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", content or "") if p.strip()]
+
+    passages, current = [], ""
+    for piece in (part for p in paragraphs for part in _split_long(p, max_chars)):
+        if current and len(current) + len(piece) + 2 > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+
+    if not passages:
+        return [title] if title else []
+    return [f"{title}\n\n{p}" if title else p for p in passages]
+
+
+# ---- черга (ті самі embedding_worker і EMBEDDING_JOB_HANDLERS, що й для QAEntry)
+def enqueue_instruction(instruction_id: int) -> None:
+    """Як qa_app.services.embedding_jobs.enqueue_entry: у синхронному режимі рахуємо після коміту."""
+    if getattr(settings, "EMBEDDING_JOBS_ASYNC", True):
+        return
+    transaction.on_commit(lambda: process_instruction(instruction_id))
+
+
+def process_instruction(instruction_id: int) -> bool:
+    """
+    Перерізає інструкцію на фрагменти й рахує їм embedding-и (батчем, через кеш embeddings).
+    Якщо fingerprint фрагментів не змінився — OpenAI не викликаємо.
+    Повертає True, якщо інструкція стала ready.
+    """
+    instruction = Instruction.objects.filter(pk=instruction_id).only("id", "title", "content", "embedding_fingerprint").first()
+    if instruction is None:
+        return False
+
+    passages = split_passages(instruction.title, instruction.content)
+    norm_passages = [normalize_text(p) for p in passages]
+    fingerprint = texts_fingerprint(norm_passages)
+    unchanged = (
+        fingerprint == instruction.embedding_fingerprint
+        and InstructionChunk.objects.filter(instruction_id=instruction_id).exists()
+    )
+    vectors = [] if unchanged else embed_texts_sync(norm_passages)
+
+    with transaction.atomic():
+        locked = Instruction.objects.select_for_update().filter(pk=instruction_id).only("title", "content").first()
+        if locked is None or (locked.title, locked.content) != (instruction.title, instruction.content):
+            # текст змінили, поки ми ходили в OpenAI: save() уже повернув інструкцію в pending
+            return False
+        if not unchanged:
+            InstructionChunk.objects.filter(instruction_id=instruction_id).delete()
+            InstructionChunk.objects.bulk_create([
+                InstructionChunk(instruction_id=instruction_id, position=i, text=text, embedding=vec)
+                for i, (text, vec) in enumerate(zip(passages, vectors))
+            ])
+        # update() замість save(): save() знову поставив би інструкцію в чергу
+        Instruction.objects.filter(pk=instruction_id).update(
+            embedding_status=Status.READY,
+            embedding_status_at=timezone.now(),
+            embedding_fingerprint=fingerprint,
+        )
+    return True
+
+
+def process_pending(limit: int = 20) -> int:
+    """Обробник для manage.py embedding_worker: повертає кількість оброблених інструкцій."""
+    ids = claim_pending(Instruction.objects.all(), limit)
+    for instruction_id in ids:
+        try:
+            process_instruction(instruction_id)
+        except Exception:
+            logger.exception("Embedding job failed for Instruction id=%s", instruction_id)
+            Instruction.objects.filter(pk=instruction_id, embedding_status=Status.PROCESSING).update(
+                embedding_status=Status.FAILED, embedding_status_at=timezone.now()
+            )
+    return len(ids)
+
+
+# ---- пошук
+def _rank_instructions_sync(q_vec, limit: int, offset: int = 0) -> List[dict]:
+    """
+    Найближчі фрагменти через HNSW (ef_search — не менше, ніж фрагментів потрібно), групування за інструкцією
+    (краща схожість фрагмента), поріг SIM_THRESHOLD, потім один запит за заголовками.
+    """
+    qs = (
+        InstructionChunk.objects
+        .annotate(distance=CosineDistance("embedding", q_vec))
+        .order_by("distance")
+        .values_list("instruction_id", "distance")
+    )
+    fetch = (offset + limit) * CHUNKS_PER_RESULT
+    # HNSW повертає не більше ef_search рядків — інакше сторінки обрізались би мовчки
+    # (1000 — максимум ef_search у pgvector)
+    ef_search = min(max(int(getattr(settings, "SEARCH_HNSW_EF_SEARCH", 40)), fetch), 1000)
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            apply_ann_settings(cur, ef_search=ef_search)
+        rows = list(qs[:fetch])
+
+    best: dict[int, float] = {}
+    for instruction_id, distance in rows:
+        similarity = 1.0 - float(distance)
+        if similarity >= SIM_THRESHOLD and instruction_id not in best:
+            best[instruction_id] = similarity
+
+    ids = list(best)[offset:offset + limit]
+    titles = dict(Instruction.objects.filter(pk__in=ids).values_list("id", "title"))
+    return [{"id": i, "title": titles[i]} for i in ids if i in titles]
+
+
+async def semantic_search(query: str, limit: int, offset: int = 0) -> List[dict]:
+    """Інструкції, найближчі за змістом до вільного запиту: [{"id", "title"}] за спаданням схожості."""
+    norm_q = normalize_text(query)
+    if not norm_q:
+        return []
+    q_vec = await embed_text_async(norm_q)
+    return await sync_to_async(_rank_instructions_sync)(q_vec, limit, offset)
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from instructions_app.models import Instruction, InstructionCategory, InstructionSubcategory, Tag
+from instructions_app.services.catalogue import invalidate_catalogue
+from instructions_app.services.fulltext import update_search_vector
+
+
+@receiver(post_save, sender=Instruction)
+def _instruction_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_vector([instance.pk])
+
+
+@receiver(m2m_changed, sender=Instruction.tags.through)
+def _instruction_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            update_search_vector([instance.pk])
+        return
+    # зміни з боку тега: tag.instructions.add/remove/clear
+    if action == "pre_clear":
+        instance._fts_instruction_ids = list(instance.instructions.values_list("pk", flat=True))
+    elif action == "post_clear":
+        update_search_vector(getattr(instance, "_fts_instruction_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        update_search_vector(pk_set or ())
+
+
+@receiver(post_save, sender=Tag)
+def _tag_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        # перейменування тега змінює tsvector усіх його інструкцій
+        update_search_vector(instance.instructions.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def _tag_deleting(sender, instance, **kwargs):
+    # зв'язки M2M видаляються каскадом без m2m_changed — запам'ятовуємо інструкції заздалегідь
+    instance._fts_instruction_ids = list(instance.instructions.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def _tag_deleted(sender, instance, **kwargs):
+    update_search_vector(getattr(instance, "_fts_instruction_ids", ()))
+
+
+@receiver(post_save, sender=InstructionCategory)
+@receiver(post_delete, sender=InstructionCategory)
+@receiver(post_save, sender=InstructionSubcategory)
+@receiver(post_delete, sender=InstructionSubcategory)
+def _catalogue_changed(sender, **kwargs):
+    # після коміту, щоб наступний запит не закешував дерево зі старими даними
+    transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(post_save, sender=Instruction)
+@receiver(post_delete, sender=Instruction)
+def _instruction_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_catalogue(instance.pk))
@@ -4,6 +4,7 @@ from . import views
 from .views import search_instructions
 
 urlpatterns = [
+    path('catalogue/', views.get_catalogue_tree, name='get_catalogue'),
     path('categories/', views.get_categories, name='get_categories'),
     path('subcategories/<int:category_id>/', views.get_subcategories, name='get_subcategories'),
     path('instructions/<int:subcategory_id>/', views.get_instructions, name='get_instructions'),
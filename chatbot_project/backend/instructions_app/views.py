@@ -1,13 +1,24 @@
 import json
+import logging
 from asgiref.sync import sync_to_async
-from django.db.models import Q
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from .models import InstructionCategory, InstructionSubcategory, Instruction
+from .services.catalogue import get_catalogue, get_instruction_detail as get_instruction_detail_cached
+from .services.fulltext import search_queryset
+from .services.semantic import semantic_search
 from backend.core.security import require_api_key
 from backend.core.auth import require_telegram_access
 
+logger = logging.getLogger("instructions_app")
+
+# "semantic" — за змістом (embeddings), "fulltext" — Postgres FTS
+SEARCH_MODE = getattr(settings, "INSTRUCTION_SEARCH_MODE", "semantic")
+SEARCH_PAGE_SIZE = getattr(settings, "INSTRUCTION_SEARCH_PAGE_SIZE", 20)
+SEARCH_MAX_PAGE_SIZE = getattr(settings, "INSTRUCTION_SEARCH_MAX_PAGE_SIZE", 50)
+
 
 @csrf_exempt
 @require_api_key
@@ -21,6 +32,32 @@ async def get_categories(request):
     return JsonResponse(data, safe=False)
 
 
+def _etag_response(request, rendered: dict) -> HttpResponse:
+    """rendered — {"etag", "body"} із services.catalogue; збіг If-None-Match → 304 без тіла."""
+    etag = rendered["etag"]
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(rendered["body"], content_type="application/json")
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@csrf_exempt
+@require_api_key
+@require_telegram_access
+async def get_catalogue_tree(request):
+    """
+    Увесь каталог одним запитом: [{id, name, subcategories: [{id, name, instructions: [{id, title}]}]}].
+    Відповідь кешується на сервері; клієнт перевіряє актуальність через If-None-Match → 304.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    return _etag_response(request, await get_catalogue())
+
+
 @csrf_exempt
 @require_api_key
 @require_telegram_access
@@ -45,39 +82,65 @@ async def get_instructions(request, subcategory_id):
     return JsonResponse(data, safe=False)
 
 
+def _positive_int(value, default: int) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
 @csrf_exempt
 @require_api_key
 @require_telegram_access
 async def search_instructions(request):
+    """
+    Пошук інструкцій за вільним запитом, ?mode=semantic|fulltext (за замовчуванням INSTRUCTION_SEARCH_MODE):
+    - semantic — найближчі за змістом фрагменти (InstructionChunk, HNSW); якщо embeddings недоступні
+      або нічого не пройшло поріг — відповідаємо повнотекстовим пошуком;
+    - fulltext — tsvector + GIN, триграми для часткових слів, з рангуванням.
+    Пагінація: ?page=1&page_size=20; тіло — як і раніше список, наступна сторінка — у заголовку X-Next-Page,
+    фактичний режим — у X-Search-Mode.
+    """
     query = request.GET.get('query', '').strip()
     if not query:
         return JsonResponse([], safe=False)
 
-    instructions = await sync_to_async(list)(
-        Instruction.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct().values('id', 'title')
-    )
-    return JsonResponse(instructions, safe=False)
+    mode = request.GET.get('mode') or SEARCH_MODE
+    page = _positive_int(request.GET.get('page'), 1)
+    page_size = min(_positive_int(request.GET.get('page_size'), SEARCH_PAGE_SIZE), SEARCH_MAX_PAGE_SIZE)
+    offset = (page - 1) * page_size
+
+    # +1 рядок, щоб знати про наступну сторінку без COUNT(*)
+    rows = []
+    if mode == 'semantic':
+        try:
+            rows = await semantic_search(query, page_size + 1, offset)
+        except Exception:
+            logger.exception("Semantic instruction search failed, falling back to full-text")
+        if not rows and page == 1:
+            mode = 'fulltext'
+    if mode != 'semantic':
+        mode = 'fulltext'
+        rows = await sync_to_async(list)(
+            search_queryset(query).values('id', 'title')[offset:offset + page_size + 1]
+        )
+
+    response = JsonResponse(rows[:page_size], safe=False)
+    response['X-Search-Mode'] = mode
+    if len(rows) > page_size:
+        response['X-Next-Page'] = str(page + 1)
+    return response
 
 
 @csrf_exempt
 @require_api_key
 @require_telegram_access
 async def get_instruction_detail(request, instruction_id):
+    """Деталі інструкції з кешу каталогу; ETag / If-None-Match → 304, як і для /catalogue/."""
     if request.method != 'GET':
         return JsonResponse({"error": "Method not allowed"}, status=405)
 
-    try:
-        instruction = await Instruction.objects.aget(id=instruction_id)
-    except Instruction.DoesNotExist:
+    detail = await get_instruction_detail_cached(instruction_id)
+    if detail is None:
         return JsonResponse({"error": "Instruction not found"}, status=404)
-
-    data = {
-        "title": instruction.title,
-        "content": instruction.content,
-        "image_url": instruction.image.url if instruction.image else None,
-    }
-    return JsonResponse(data)
+    return _etag_response(request, detail)
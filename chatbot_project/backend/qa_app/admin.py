@@ -1,38 +1,52 @@
 from __future__ import annotations
 from django.contrib import admin
 from django import forms
-from django.http import HttpResponse
-import io
+from django.utils import timezone
 import datetime
 
-# Для експорту Excel
-import openpyxl
-from openpyxl.utils import get_column_letter
-
 from .models import (
     QAEntry,
     UnansweredQuestion,
     Category,
     QuestionLog,
+    QuestionLogDailyRollup,
     AllowedTelegramUser,
     QAVariant,
 )
+from .services.embedding_jobs import enqueue_entry
 from audittrail.admin_mixins import AuditedModelAdmin
+from backend.core.auth import invalidate_telegram_users
+from backend.core.exports import csv_response, export_chunk_size, xlsx_response
 from audittrail.models import AuditAction
 
 
 # --------- QAEntry
 @admin.register(QAEntry)
 class QAEntryAdmin(AuditedModelAdmin):
-    list_display = ("question", "category")
-    list_filter = ("category",)
+    list_display = ("question", "category", "embedding_status")
+    list_filter = ("category", "embedding_status")
     search_fields = ("question", "synonyms", "answer")
     ordering = ("question",)
     list_per_page = 25
+    actions = ("requeue_embeddings",)
 
     # виключаємо embedding з audit (занадто великий масив)
     audit_exclude_fields = ("id", "embedding")
 
+    @admin.action(description="Перерахувати embedding-и (у фоні)")
+    def requeue_embeddings(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        # старі вектори лишаються (пошук працює по них); порожній fingerprint змушує embedding_worker
+        # перерахувати всі варіанти і перезаписати їх на місці
+        updated = QAEntry.objects.filter(pk__in=ids).update(
+            embedding_status=QAEntry.EmbeddingStatus.PENDING,
+            embedding_status_at=timezone.now(),
+            embedding_fingerprint="",
+        )
+        for entry_id in ids:
+            enqueue_entry(entry_id)
+        self.message_user(request, f"Поставлено в чергу: {updated}")
+
     def delete_queryset(self, request, queryset):
         # Логуємо кожен QAEntry перед видаленням (bulk)
         for obj in queryset:
@@ -80,42 +94,77 @@ class QuestionLogAdmin(admin.ModelAdmin):
         'asked_by__full_name',
         'asked_by__user_id',
     )
-    actions = ("export_to_excel",)
+    list_select_related = ('asked_by',)
+    # без COUNT(*) по всьому журналу (мільйони рядків) на кожній сторінці списку
+    show_full_result_count = False
+    actions = ("export_to_excel", "export_to_csv")
+
+    EXPORT_HEADERS = ["Timestamp", "Question", "Answer found", "Similarity", "Asked by (fullname)", "Asked by (user_id)"]
+
+    def _export_rows(self, queryset):
+        """Рядки експорту: asked_by підтягується JOIN-ом, записи читаються з БД порціями."""
+        logs = (
+            queryset.select_related("asked_by")
+            .only("timestamp", "question", "answer_found", "similarity", "asked_by__full_name", "asked_by__user_id")
+            .order_by("timestamp")
+        )
+        for q in logs.iterator(chunk_size=export_chunk_size()):
+            ts = q.timestamp.astimezone().strftime("%Y-%m-%d %H:%M:%S") if q.timestamp else ""
+            asked_by_name = q.asked_by.full_name if q.asked_by else ""
+            asked_by_id = q.asked_by.user_id if q.asked_by else ""
+            yield [ts, q.question, "Yes" if q.answer_found else "No", q.similarity if q.similarity is not None else "", asked_by_name, asked_by_id]
+
+    def _export_filename(self, ext):
+        return f"question_logs_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ext}"
 
     def export_to_excel(self, request, queryset):
         """
-        Експортує вибрані записи QuestionLog до Excel.
+        Експортує вибрані записи QuestionLog до Excel (write-only, через тимчасовий файл).
         Колонки: Timestamp, Question, Answer found, Similarity, Asked by (ПІБ), Asked by ID
         """
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "QuestionLog"
+        return xlsx_response(
+            request,
+            self.EXPORT_HEADERS,
+            self._export_rows(queryset),
+            self._export_filename("xlsx"),
+            title="QuestionLog",
+            widths=(21, 60, 14, 12, 30, 20),
+        )
+
+    export_to_excel.short_description = "Експорт вибраних записів у Excel (.xlsx)"
 
-        headers = ["Timestamp", "Question", "Answer found", "Similarity", "Asked by (fullname)", "Asked by (user_id)"]
-        ws.append(headers)
+    def export_to_csv(self, request, queryset):
+        """Потоковий CSV — для великих вибірок (рік логів), не тримає файл ні в пам'яті, ні на диску."""
+        return csv_response(request, self.EXPORT_HEADERS, self._export_rows(queryset), self._export_filename("csv"))
 
-        for q in queryset.order_by("timestamp"):
-            ts = q.timestamp.astimezone().strftime("%Y-%m-%d %H:%M:%S") if q.timestamp else ""
-            asked_by_name = q.asked_by.full_name if getattr(q, "asked_by", None) else ""
-            asked_by_id = q.asked_by.user_id if getattr(q, "asked_by", None) else ""
-            row = [ts, q.question, "Yes" if q.answer_found else "No", q.similarity if q.similarity is not None else "", asked_by_name, asked_by_id]
-            ws.append(row)
+    export_to_csv.short_description = "Експорт вибраних записів у CSV (потоково)"
 
-        # автопідігнати ширину колонок
-        for i, column_cells in enumerate(ws.columns, 1):
-            length = max(len(str(cell.value or "")) for cell in column_cells) + 2
-            ws.column_dimensions[get_column_letter(i)].width = min(length, 60)
 
-        stream = io.BytesIO()
-        wb.save(stream)
-        stream.seek(0)
+# --------- Денні зведення QuestionLog (заповнює rollup_question_logs / prune_question_logs)
+@admin.register(QuestionLogDailyRollup)
+class QuestionLogDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'asked_by', 'category', 'total', 'answered', 'hit_rate_display', 'avg_similarity_display')
+    list_filter = ('day', 'category')
+    search_fields = ('asked_by__full_name', 'asked_by__user_id')
+    list_select_related = ('asked_by', 'category')
+    date_hierarchy = 'day'
 
-        filename = f"question_logs_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response = HttpResponse(stream.read(), content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+    def hit_rate_display(self, obj):
+        return f"{obj.hit_rate:.0%}"
 
-    export_to_excel.short_description = "Експорт вибраних записів у Excel (.xlsx)"
+    hit_rate_display.short_description = "Частка з відповіддю"
+
+    def avg_similarity_display(self, obj):
+        avg = obj.avg_similarity
+        return "—" if avg is None else f"{avg:.3f}"
+
+    avg_similarity_display.short_description = "Середня схожість"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # --------- UnansweredQuestion з додатковими полями (тепер успадковано від AuditedModelAdmin)
@@ -196,10 +245,16 @@ class AllowedTelegramUserAdmin(AuditedModelAdmin):
 
     @admin.action(description="Позначити як Активний")
     def make_active(self, request, queryset):
+        user_ids = list(queryset.values_list("user_id", flat=True))
         updated = queryset.update(status=AllowedTelegramUser.Status.ACTIVE)
+        # update() не шле сигналів — скидаємо кеш доступу явно
+        invalidate_telegram_users(*user_ids)
         self.message_user(request, f"Оновлено: {updated}")
 
     @admin.action(description="Позначити як Деактивований")
     def make_inactive(self, request, queryset):
+        user_ids = list(queryset.values_list("user_id", flat=True))
         updated = queryset.update(status=AllowedTelegramUser.Status.INACTIVE)
+        # update() не шле сигналів — скидаємо кеш доступу явно
+        invalidate_telegram_users(*user_ids)
         self.message_user(request, f"Оновлено: {updated}")
@@ -5,3 +5,6 @@ class QaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qa_app'
     verbose_name = "Питання та Відповіді"
+
+    def ready(self):
+        from qa_app import signals  # noqa: F401
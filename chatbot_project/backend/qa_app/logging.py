@@ -14,8 +14,9 @@ def log_question_from_request(
     Використовуй у view після обчислення відповіді/схожості.
     """
     tg_id_header = request.headers.get("X-Telegram-Id")
-    asked_by = None
-    if tg_id_header:
+    # після require_telegram_access користувач уже на request
+    asked_by = getattr(request, "telegram_user", None)
+    if asked_by is None and tg_id_header:
         try:
             tg_id = int(tg_id_header)
             asked_by = AllowedTelegramUser.objects.filter(user_id=tg_id).first()
@@ -0,0 +1,44 @@
+import math
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from qa_app.models import QAVariant
+from qa_app.services.vector_search import HNSW_INDEX, IVFFLAT_INDEX
+
+
+class Command(BaseCommand):
+    help = "(Re)create the ANN index on QAVariant.embedding: HNSW (default) or IVFFlat, cosine opclass."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=("hnsw", "ivfflat"), default="hnsw")
+        parser.add_argument("--m", type=int, default=16, help="HNSW: max connections per layer")
+        parser.add_argument("--ef-construction", type=int, default=64, help="HNSW: build-time candidate list size")
+        parser.add_argument("--lists", type=int, default=None,
+                            help="IVFFlat: number of lists (default: rows/1000, min 10)")
+
+    def handle(self, *args, **options):
+        kind = options["kind"]
+        if kind == "hnsw":
+            sql = (
+                f"CREATE INDEX {HNSW_INDEX} ON qa_app_qavariant "
+                f"USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {int(options['m'])}, ef_construction = {int(options['ef_construction'])})"
+            )
+        else:
+            # IVFFlat будується по наявних даних — запускати після наповнення бази
+            lists = options["lists"]
+            if not lists:
+                rows = QAVariant.objects.exclude(embedding__isnull=True).count()
+                lists = max(10, math.ceil(rows / 1000))
+            sql = (
+                f"CREATE INDEX {IVFFLAT_INDEX} ON qa_app_qavariant "
+                f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(lists)})"
+            )
+
+        with connection.cursor() as cur:
+            # два ANN-індекси на одній колонці лише заважають планувальнику
+            cur.execute(f"DROP INDEX IF EXISTS {HNSW_INDEX}")
+            cur.execute(f"DROP INDEX IF EXISTS {IVFFLAT_INDEX}")
+            self.stdout.write(sql)
+            cur.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f"{kind} index ready."))
@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Background worker for embedding jobs: polls pending records and computes their embeddings "
+        "outside of admin/request transactions. Handlers come from settings.EMBEDDING_JOB_HANDLERS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0, help="Sleep between polls when idle (sec)")
+        parser.add_argument("--batch", type=int, default=20, help="Max records claimed per handler per poll")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        handlers = [import_string(path) for path in getattr(settings, "EMBEDDING_JOB_HANDLERS", [])]
+        if not handlers:
+            self.stdout.write(self.style.WARNING("No EMBEDDING_JOB_HANDLERS configured."))
+            return
+
+        self._stop = False
+
+        def _request_stop(signum, frame):
+            self._stop = True
+
+        signal.signal(signal.SIGTERM, _request_stop)
+        signal.signal(signal.SIGINT, _request_stop)
+
+        self.stdout.write(f"Embedding worker started ({len(handlers)} handlers).")
+        while not self._stop:
+            close_old_connections()
+            processed = 0
+            for handler in handlers:
+                n = handler(limit=options["batch"])
+                if n:
+                    self.stdout.write(f"{handler.__module__}.{handler.__name__}: {n} processed")
+                processed += n
+            if options["once"] and not processed:
+                break
+            if not processed:
+                time.sleep(options["interval"])
+        self.stdout.write("Embedding worker stopped.")
@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from qa_app.models import QAVariant
+from qa_app.services.vector_search import (
+    HNSW_INDEX,
+    IVFFLAT_INDEX,
+    apply_ann_settings,
+    vector_literal,
+)
+
+TOPK_SQL = """
+    SELECT id FROM qa_app_qavariant
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s
+"""
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+class Command(BaseCommand):
+    help = "Measure recall@k and latency of the ANN index against exact (sequential) search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=50, help="How many variant embeddings to use as queries")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--ef-search", type=_int_list, default=[10, 20, 40, 80, 160])
+        parser.add_argument("--probes", type=_int_list, default=[1, 5, 10, 20, 50])
+
+    def _topk(self, vec: str, k: int, *, exact: bool = False, ef_search=None, probes=None):
+        with transaction.atomic(), connection.cursor() as cur:
+            if exact:
+                cur.execute("SET LOCAL enable_indexscan = off")
+            else:
+                apply_ann_settings(cur, ef_search=ef_search, probes=probes)
+            started = time.perf_counter()
+            cur.execute(TOPK_SQL, [vec, k])
+            ids = [row[0] for row in cur.fetchall()]
+            return ids, (time.perf_counter() - started) * 1000
+
+    def _run(self, label: str, queries, truth, k: int, **params):
+        recalls, latencies = [], []
+        for vec, exact_ids in zip(queries, truth):
+            ids, ms = self._topk(vec, k, **params)
+            recalls.append(len(set(ids) & set(exact_ids)) / max(len(exact_ids), 1))
+            latencies.append(ms)
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        self.stdout.write(
+            f"{label:<22} recall@{k}={statistics.mean(recalls):.3f}  "
+            f"avg={statistics.mean(latencies):.2f}ms  p95={p95:.2f}ms"
+        )
+
+    def handle(self, *args, **options):
+        k = options["k"]
+        sample = list(
+            QAVariant.objects.exclude(embedding__isnull=True)
+            .order_by("?")
+            .values_list("embedding", flat=True)[: options["samples"]]
+        )
+        if not sample:
+            self.stdout.write(self.style.WARNING("No variants with embeddings."))
+            return
+        queries = [vector_literal(v) for v in sample]
+
+        with connection.cursor() as cur:
+            cur.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = 'qa_app_qavariant' AND indexname IN (%s, %s)",
+                [HNSW_INDEX, IVFFLAT_INDEX],
+            )
+            indexes = {row[0] for row in cur.fetchall()}
+        if not indexes:
+            self.stdout.write(self.style.WARNING("No ANN index found — run `manage.py ann_index` first."))
+
+        self.stdout.write(f"{len(queries)} queries, k={k}, indexes: {', '.join(sorted(indexes)) or '-'}")
+        truth, exact_ms = [], []
+        for vec in queries:
+            ids, ms = self._topk(vec, k, exact=True)
+            truth.append(ids)
+            exact_ms.append(ms)
+        self.stdout.write(f"{'exact (seq scan)':<22} recall@{k}=1.000  avg={statistics.mean(exact_ms):.2f}ms")
+
+        if HNSW_INDEX in indexes:
+            for ef in options["ef_search"]:
+                self._run(f"hnsw ef_search={ef}", queries, truth, k, ef_search=ef)
+        if IVFFLAT_INDEX in indexes:
+            for probes in options["probes"]:
+                self._run(f"ivfflat probes={probes}", queries, truth, k, probes=probes)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from qa_app.services.log_partitions import (
+    add_months,
+    default_partition_days,
+    drop_partition,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    purge_default_partition,
+)
+from qa_app.services.log_rollup import day_bounds, rollup_days
+
+
+class Command(BaseCommand):
+    help = (
+        "QuestionLog retention: pre-create upcoming monthly partitions, roll up and drop partitions "
+        "older than the retention window. Run daily (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=settings.QUESTION_LOG_RETENTION_MONTHS,
+                            help="Keep this many full months before the current one")
+        parser.add_argument("--ahead", type=int, default=settings.QUESTION_LOG_PARTITIONS_AHEAD,
+                            help="Create partitions this many months ahead")
+        parser.add_argument("--no-rollup", action="store_true",
+                            help="Drop without recomputing daily rollups first")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("qa_app_questionlog is not partitioned — apply qa_app migrations first.")
+        if options["months"] < 1:
+            raise CommandError("--months must be >= 1")
+
+        today = timezone.localdate()
+        current = month_start(today)
+        cutoff_month = add_months(current, -options["months"])
+        cutoff, _ = day_bounds(cutoff_month)
+
+        upcoming = [add_months(current, i) for i in range(options["ahead"] + 1)]
+        expired = {m: name for m, name in list_partitions().items() if m < cutoff_month}
+        stray_days = default_partition_days(cutoff)
+
+        self.stdout.write(f"Retention cutoff: {cutoff_month} ({len(expired)} partitions to drop, "
+                          f"{len(stray_days)} days in default partition)")
+        if options["dry_run"]:
+            for name in expired.values():
+                self.stdout.write(f"  would drop {name}")
+            return
+
+        for name in ensure_partitions(upcoming[0], upcoming[-1]):
+            self.stdout.write(f"  partition {name}")
+
+        # спершу зведення, потім видалення: після drop сирих даних уже немає
+        if not options["no_rollup"]:
+            days = set(stray_days)
+            for month in expired:
+                day = month
+                while day < add_months(month, 1):
+                    days.add(day)
+                    day += timedelta(days=1)
+            rows = rollup_days(sorted(days))
+            self.stdout.write(f"  rolled up {len(days)} days ({rows} rows)")
+
+        for name in expired.values():
+            drop_partition(name)
+            self.stdout.write(f"  dropped {name}")
+        purged = purge_default_partition(cutoff)
+        if purged:
+            self.stdout.write(f"  purged {purged} rows from default partition")
+        self.stdout.write(self.style.SUCCESS("Retention done."))
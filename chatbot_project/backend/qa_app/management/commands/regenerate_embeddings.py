@@ -1,37 +1,160 @@
-from django.core.management.base import BaseCommand
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 from qa_app.models import QAEntry, QAVariant
 from qa_app.text_utils import normalize_text
-from qa_app.services.embeddings import embed_text_sync
+from qa_app.services.embeddings import embed_texts_sync, texts_fingerprint
+from qa_app.services.lexical_index import lexical_index
+from qa_app.services.vector_index import vector_index
 
 class Command(BaseCommand):
-    help = "Rebuild embeddings for all QAEntry and QAVariant using normalized text."
+    help = (
+        "Rebuild embeddings for all QAEntry and QAVariant using normalized text. "
+        "Embedding calls run concurrently, writes use bulk_create, progress is checkpointed "
+        "and entries whose variants/model did not change are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch", type=int, default=100,
+            help="How many entries share one batched embeddings call (texts are chunked by EMBED_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="How many batches are embedded in parallel",
+        )
+        parser.add_argument(
+            "--checkpoint", default=".regenerate_embeddings.json",
+            help="File with the last committed entry id",
+        )
+        parser.add_argument("--resume", action="store_true", help="Continue after the id stored in --checkpoint")
+        parser.add_argument("--force", action="store_true", help="Re-embed even unchanged entries")
+
+    # ---- checkpoint
+    def _read_checkpoint(self, path):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                return int(json.load(fh).get("last_pk", 0))
+        except FileNotFoundError:
+            return 0
+        except (ValueError, TypeError) as exc:
+            raise CommandError(f"Bad checkpoint file {path}: {exc}")
+
+    def _write_checkpoint(self, path, last_pk):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"last_pk": last_pk}, fh)
+        os.replace(tmp, path)
+
+    # ---- pipeline
+    def _batches(self, qs, batch_size, force):
+        """
+        Віддає (записи_для_перерахунку, їхні_тексти, останній_pk_пачки).
+        Незмінені записи (той самий fingerprint) відкидаємо, але враховуємо в чекпоінті.
+        """
+        todo, last_pk = [], 0
+        for entry in qs.iterator(chunk_size=500):
+            last_pk = entry.pk
+            norm_texts = [normalize_text(text) for text in entry.get_variants_list()]
+            fingerprint = texts_fingerprint(norm_texts)
+            if force or entry.embedding_fingerprint != fingerprint:
+                entry.embedding_fingerprint = fingerprint
+                todo.append((entry, norm_texts))
+            else:
+                self.skipped += 1
+            if len(todo) >= batch_size:
+                yield todo, last_pk
+                todo = []
+        if todo or last_pk:
+            yield todo, last_pk
+
+    def _embed(self, todo):
+        texts = [text for _, norm_texts in todo for text in norm_texts]
+        return embed_texts_sync(texts) if texts else []
+
+    def _write(self, todo, vectors):
+        entries, variants, offset = [], [], 0
+        for entry, norm_texts in todo:
+            entry_vectors = vectors[offset:offset + len(norm_texts)]
+            offset += len(norm_texts)
+            q = (entry.question or "").strip()
+            entry.embedding = entry_vectors[0] if q else None
+            entry.embedding_status = QAEntry.EmbeddingStatus.READY
+            entry.embedding_status_at = timezone.now()
+            entries.append(entry)
+            for text, norm, vec in zip(entry.get_variants_list(), norm_texts, entry_vectors):
+                variants.append(QAVariant(entry=entry, text=text, normalized_text=norm, embedding=vec))
+
+        with transaction.atomic():
+            QAVariant.objects.filter(entry__in=[e.pk for e in entries]).delete()
+            QAVariant.objects.bulk_create(variants, batch_size=500)
+            QAEntry.objects.bulk_update(
+                entries,
+                ["embedding", "embedding_fingerprint", "embedding_status", "embedding_status_at"],
+                batch_size=200,
+            )
+        # bulk_create не шле post_save — скидаємо in-memory індекси явно
+        vector_index.invalidate()
+        lexical_index.invalidate()
+        return len(entries), len(variants)
 
     def handle(self, *args, **options):
-        qs = QAEntry.objects.all()
+        checkpoint = options["checkpoint"]
+        start_after = self._read_checkpoint(checkpoint) if options["resume"] else 0
+
+        qs = (
+            QAEntry.objects.filter(pk__gt=start_after)
+            .order_by("pk")
+            .only("id", "question", "synonyms", "embedding_fingerprint")
+        )
         total = qs.count()
-        self.stdout.write(f"Will process {total} entries...")
-        i = 0
-        for entry in qs.iterator():
-            i += 1
-            self.stdout.write(f"[{i}/{total}] entry id={entry.pk} - {entry.question!r} ...", ending=" ")
-            try:
-                with transaction.atomic():
-                    # нормалізуємо головне питання і робимо embedding
-                    q = (entry.question or "").strip()
-                    norm_q = normalize_text(q)
-                    emb = embed_text_sync(norm_q) if q else None
-
-                    # ОНОВЛЕННЯ QAEntry.embedding через queryset.update() щоб уникнути повторного виклику save()
-                    QAEntry.objects.filter(pk=entry.pk).update(embedding=emb)
-
-                    # Перегенеруємо варіанти
-                    QAVariant.objects.filter(entry=entry).delete()
-                    for text in entry.get_variants_list():
-                        norm_text = normalize_text(text)
-                        vec = embed_text_sync(norm_text)
-                        QAVariant.objects.create(entry=entry, text=text, embedding=vec)
-                self.stdout.write(self.style.SUCCESS("OK"))
-            except Exception as exc:
-                self.stdout.write(self.style.ERROR(f"FAILED: {exc}"))
-        self.stdout.write(self.style.SUCCESS("All done."))
+        concurrency = max(1, options["concurrency"])
+        self.skipped = 0
+        done_entries = done_variants = 0
+        committed_pk = start_after
+        self.stdout.write(f"Will check {total} entries (after id={start_after}), concurrency={concurrency}...")
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = deque()
+
+            def drain_one():
+                nonlocal done_entries, done_variants, committed_pk
+                todo, last_pk, future = pending.popleft()
+                try:
+                    vectors = future.result()
+                except Exception as exc:
+                    for _, _, other in pending:
+                        other.cancel()
+                    raise CommandError(
+                        f"Embedding failed after id={committed_pk}: {exc}. "
+                        f"Re-run with --resume to continue from the checkpoint."
+                    )
+                if todo:
+                    n_entries, n_variants = self._write(todo, vectors)
+                    done_entries += n_entries
+                    done_variants += n_variants
+                self._write_checkpoint(checkpoint, last_pk)
+                committed_pk = last_pk
+                self.stdout.write(
+                    f"up to id={last_pk}: rebuilt {done_entries} entries / {done_variants} variants, "
+                    f"skipped {self.skipped} unchanged"
+                )
+
+            # embedding наступних пачок іде паралельно із записом поточної в БД
+            for todo, last_pk in self._batches(qs, max(1, options["batch"]), options["force"]):
+                pending.append((todo, last_pk, pool.submit(self._embed, todo)))
+                if len(pending) >= concurrency:
+                    drain_one()
+            while pending:
+                drain_one()
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"All done: rebuilt {done_entries} entries / {done_variants} variants, skipped {self.skipped}."
+        ))
@@ -1,16 +1,20 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from qa_app.models import QAEntry
+from qa_app.services.embedding_jobs import enqueue_entry
 
 class Command(BaseCommand):
-    help = "Recompute embeddings for all QAEntry and their QAVariants using normalized text."
+    help = "Queue all QAEntry for embedding recomputation (processed by `manage.py embedding_worker`)."
 
     def handle(self, *args, **options):
-        qs = QAEntry.objects.all()
-        total = qs.count()
-        self.stdout.write(f"Reindexing {total} entries...")
-        for i, entry in enumerate(qs, start=1):
-            # викликаємо save() — в ньому зараз перегенерується embedding і QAVariant
-            entry.save()
-            if i % 50 == 0:
-                self.stdout.write(f"{i}/{total} done")
+        # save() не перераховує незмінені варіанти — тому ставимо в чергу з порожнім fingerprint:
+        # воркер перерахує всі варіанти, а до того пошук працює по старих векторах
+        total = QAEntry.objects.update(
+            embedding_status=QAEntry.EmbeddingStatus.PENDING,
+            embedding_status_at=timezone.now(),
+            embedding_fingerprint="",
+        )
+        for entry_id in QAEntry.objects.values_list("pk", flat=True):
+            enqueue_entry(entry_id)
+        self.stdout.write(f"Queued {total} entries.")
         self.stdout.write("Done.")
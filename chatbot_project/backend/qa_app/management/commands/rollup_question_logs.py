@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from qa_app.services.log_rollup import rollup_day
+
+
+class Command(BaseCommand):
+    help = "Recompute daily QuestionLog rollups (counts, hit rate, similarity histogram per user and category)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", action="append", default=[],
+                            help="Day to roll up, YYYY-MM-DD (repeatable)")
+        parser.add_argument("--days", type=int, default=2,
+                            help="Without --date: roll up the last N days, today included (default: 2)")
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                days = [date.fromisoformat(value) for value in options["date"]]
+            except ValueError as e:
+                raise CommandError(f"Invalid --date: {e}")
+        else:
+            today = timezone.localdate()
+            days = [today - timedelta(days=i) for i in range(max(options["days"], 1))]
+
+        for day in sorted(days):
+            rows = rollup_day(day)
+            self.stdout.write(f"{day}: {rows} rollup rows")
+        self.stdout.write(self.style.SUCCESS("Rollups done."))
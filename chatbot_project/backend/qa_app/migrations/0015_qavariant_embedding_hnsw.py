@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# ANN-індекс для QAVariant.embedding (cosine). Створюємо через RunSQL, а не Meta.indexes,
+# щоб команда `manage.py ann_index` могла замінити його на IVFFlat без розсинхрону зі станом міграцій.
+HNSW_INDEX = "qa_variant_embedding_hnsw"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0014_questionlog_asked_by'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                f"CREATE INDEX IF NOT EXISTS {HNSW_INDEX} ON qa_app_qavariant "
+                "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);"
+            ),
+            reverse_sql=f"DROP INDEX IF EXISTS {HNSW_INDEX};",
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0015_qavariant_embedding_hnsw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qaentry',
+            name='embedding_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
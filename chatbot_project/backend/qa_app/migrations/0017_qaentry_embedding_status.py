@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    QAEntry = apps.get_model('qa_app', 'QAEntry')
+    QAVariant = apps.get_model('qa_app', 'QAVariant')
+    pending_ids = QAVariant.objects.filter(embedding__isnull=True).values('entry_id')
+    QAEntry.objects.exclude(pk__in=pending_ids).update(embedding_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0016_qaentry_embedding_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qaentry',
+            name='embedding_status',
+            field=models.CharField(choices=[('pending', 'Очікує'), ('processing', 'Обробляється'), ('ready', 'Готово'), ('failed', 'Помилка')], db_index=True, default='pending', editable=False, max_length=16, verbose_name='Embedding'),
+        ),
+        migrations.AddField(
+            model_name='qaentry',
+            name='embedding_status_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
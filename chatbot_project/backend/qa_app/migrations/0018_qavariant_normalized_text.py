@@ -0,0 +1,45 @@
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# копія qa_app.text_utils.normalize_text на момент міграції — історична міграція
+# не повинна залежати від живого коду
+_KEEP_RE = re.compile(r"[^\w\-\s'’ґєіїґҐЄІЇ]+", flags=re.U)
+
+
+def normalize_text(text):
+    if not text:
+        return ""
+    s = unicodedata.normalize("NFKC", text).lower()
+    s = _KEEP_RE.sub(" ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def fill_normalized_text(apps, schema_editor):
+    QAVariant = apps.get_model('qa_app', 'QAVariant')
+    batch = []
+    for variant in QAVariant.objects.only('id', 'text').iterator(chunk_size=2000):
+        variant.normalized_text = normalize_text(variant.text)
+        batch.append(variant)
+        if len(batch) >= 2000:
+            QAVariant.objects.bulk_update(batch, ['normalized_text'])
+            batch = []
+    if batch:
+        QAVariant.objects.bulk_update(batch, ['normalized_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0017_qaentry_embedding_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qavariant',
+            name='normalized_text',
+            field=models.TextField(db_index=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_normalized_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,176 @@
+from datetime import date
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.utils import timezone
+
+# Переводимо qa_app_questionlog на помісячне секціонування за timestamp.
+# Секціонована таблиця в PostgreSQL вимагає ключа секціонування в PK, тому в БД PK = (id, timestamp);
+# для Django первинним ключем лишається id (унікальний завдяки спільній послідовності).
+
+CREATE_PARTITIONED = [
+    'ALTER TABLE qa_app_questionlog RENAME TO qa_app_questionlog_unpartitioned',
+    'CREATE SEQUENCE qa_app_questionlog_part_id_seq AS bigint',
+    '''
+    CREATE TABLE qa_app_questionlog (
+        id bigint NOT NULL DEFAULT nextval('qa_app_questionlog_part_id_seq'),
+        question text NOT NULL,
+        answer_found boolean NOT NULL,
+        similarity double precision NULL,
+        "timestamp" timestamp with time zone NOT NULL,
+        asked_by_id bigint NULL
+            REFERENCES qa_app_allowedtelegramuser (id) DEFERRABLE INITIALLY DEFERRED,
+        entry_id bigint NULL
+            REFERENCES qa_app_qaentry (id) DEFERRABLE INITIALLY DEFERRED,
+        PRIMARY KEY (id, "timestamp")
+    ) PARTITION BY RANGE ("timestamp")
+    ''',
+    'ALTER SEQUENCE qa_app_questionlog_part_id_seq OWNED BY qa_app_questionlog.id',
+    'CREATE TABLE qa_app_questionlog_default PARTITION OF qa_app_questionlog DEFAULT',
+    # індекси на батьківській таблиці автоматично створюються в кожній секції
+    'CREATE INDEX questionlog_ts_idx ON qa_app_questionlog ("timestamp")',
+    'CREATE INDEX questionlog_found_ts_idx ON qa_app_questionlog (answer_found, "timestamp")',
+    'CREATE INDEX questionlog_question_trgm ON qa_app_questionlog USING gin ((UPPER(question)) gin_trgm_ops)',
+    'CREATE INDEX qa_app_questionlog_asked_by_id_idx ON qa_app_questionlog (asked_by_id)',
+    'CREATE INDEX qa_app_questionlog_entry_id_idx ON qa_app_questionlog (entry_id)',
+    # секція місяця (межі — північ першого числа в часовому поясі tz); рядки цього місяця,
+    # що вже потрапили в default-секцію, переносимо, інакше ATTACH не пройде
+    '''
+    CREATE OR REPLACE FUNCTION qa_app_questionlog_ensure_partition(month date, tz text)
+    RETURNS text LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start date := month - (extract(day FROM month)::int - 1);
+        part text := 'qa_app_questionlog_p' || to_char(month_start, 'YYYYMM');
+        start_ts timestamptz := month_start::timestamp AT TIME ZONE tz;
+        end_ts timestamptz := (month_start + interval '1 month')::timestamp AT TIME ZONE tz;
+    BEGIN
+        IF to_regclass(part) IS NOT NULL THEN
+            RETURN part;
+        END IF;
+        EXECUTE format('CREATE TABLE %I (LIKE qa_app_questionlog INCLUDING DEFAULTS)', part);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM qa_app_questionlog_default '
+            'WHERE "timestamp" >= %L AND "timestamp" < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            start_ts, end_ts, part
+        );
+        EXECUTE format(
+            'ALTER TABLE qa_app_questionlog ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part, start_ts, end_ts
+        );
+        RETURN part;
+    END
+    $$
+    ''',
+]
+
+COPY_AND_DROP_OLD = [
+    '''
+    INSERT INTO qa_app_questionlog (id, question, answer_found, similarity, "timestamp", asked_by_id)
+    SELECT id, question, answer_found, similarity, "timestamp", asked_by_id
+    FROM qa_app_questionlog_unpartitioned
+    ''',
+    '''
+    SELECT setval('qa_app_questionlog_part_id_seq',
+                  COALESCE((SELECT max(id) FROM qa_app_questionlog), 0) + 1, false)
+    ''',
+    'DROP TABLE qa_app_questionlog_unpartitioned',
+]
+
+RESTORE_PLAIN = [
+    '''
+    CREATE TABLE qa_app_questionlog_unpartitioned (
+        id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        question text NOT NULL,
+        answer_found boolean NOT NULL,
+        similarity double precision NULL,
+        "timestamp" timestamp with time zone NOT NULL,
+        asked_by_id bigint NULL
+            REFERENCES qa_app_allowedtelegramuser (id) DEFERRABLE INITIALLY DEFERRED
+    )
+    ''',
+    '''
+    INSERT INTO qa_app_questionlog_unpartitioned (id, question, answer_found, similarity, "timestamp", asked_by_id)
+    SELECT id, question, answer_found, similarity, "timestamp", asked_by_id FROM qa_app_questionlog
+    ''',
+    '''
+    SELECT setval(pg_get_serial_sequence('qa_app_questionlog_unpartitioned', 'id'),
+                  COALESCE((SELECT max(id) FROM qa_app_questionlog_unpartitioned), 0) + 1, false)
+    ''',
+    'DROP TABLE qa_app_questionlog',
+    'DROP FUNCTION qa_app_questionlog_ensure_partition(date, text)',
+    'ALTER TABLE qa_app_questionlog_unpartitioned RENAME TO qa_app_questionlog',
+    'CREATE INDEX qa_app_questionlog_asked_by_id_idx ON qa_app_questionlog (asked_by_id)',
+]
+
+
+def _add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def partition_question_log(apps, schema_editor):
+    from django.conf import settings
+
+    connection = schema_editor.connection
+    with connection.cursor() as cur:
+        for sql in CREATE_PARTITIONED:
+            cur.execute(sql)
+        cur.execute('SELECT min("timestamp") FROM qa_app_questionlog_unpartitioned')
+        oldest = cur.fetchone()[0]
+
+        # секції від найстарішого запису до кількох місяців наперед — до копіювання, щоб рядки
+        # одразу лягли у свої секції, а не в default
+        today = timezone.localdate()
+        month = (timezone.localtime(oldest).date() if oldest else today).replace(day=1)
+        last = _add_months(today, getattr(settings, 'QUESTION_LOG_PARTITIONS_AHEAD', 2))
+        while month <= last:
+            cur.execute('SELECT qa_app_questionlog_ensure_partition(%s, %s)', [month, settings.TIME_ZONE])
+            month = _add_months(month, 1)
+
+        for sql in COPY_AND_DROP_OLD:
+            cur.execute(sql)
+
+
+def unpartition_question_log(apps, schema_editor):
+    with schema_editor.connection.cursor() as cur:
+        for sql in RESTORE_PLAIN:
+            cur.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0018_qavariant_normalized_text'),
+    ]
+
+    operations = [
+        # pg_trgm може вже бути встановлено (instructions_app) — тому не TrigramExtension, який знімає його при відкаті
+        migrations.RunSQL('CREATE EXTENSION IF NOT EXISTS pg_trgm', migrations.RunSQL.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='questionlog',
+                    name='entry',
+                    field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='question_logs', to='qa_app.qaentry', verbose_name='Відповідь'),
+                ),
+                migrations.AddIndex(
+                    model_name='questionlog',
+                    index=models.Index(fields=['timestamp'], name='questionlog_ts_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='questionlog',
+                    index=models.Index(fields=['answer_found', 'timestamp'], name='questionlog_found_ts_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='questionlog',
+                    index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('question'), name='gin_trgm_ops'), name='questionlog_question_trgm'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(partition_question_log, unpartition_question_log),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0019_questionlog_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionLogDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='День')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Запитів')),
+                ('answered', models.PositiveIntegerField(default=0, verbose_name='З відповіддю')),
+                ('similarity_sum', models.FloatField(default=0.0, verbose_name='Сума схожості')),
+                ('similarity_count', models.PositiveIntegerField(default=0, verbose_name='Запитів зі схожістю')),
+                ('similarity_histogram', models.JSONField(blank=True, default=list, verbose_name='Гістограма схожості')),
+                ('asked_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to='qa_app.allowedtelegramuser', verbose_name='Хто задав')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to='qa_app.category', verbose_name='Категорія')),
+            ],
+            options={
+                'verbose_name': 'Денна статистика запитів',
+                'verbose_name_plural': 'Денна статистика запитів',
+                'ordering': ('-day',),
+            },
+        ),
+    ]
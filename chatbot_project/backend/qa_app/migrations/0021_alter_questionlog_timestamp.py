@@ -0,0 +1,17 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_app', '0020_questionlogdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='questionlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Час запиту'),
+        ),
+    ]
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.utils import timezone
 from pgvector.django import VectorField
-from qa_app.services.embeddings import embed_text_sync
+from qa_app.services.embeddings import texts_fingerprint
+from qa_app.services.lexical_index import lexical_index
+from qa_app.services.vector_index import vector_index
 from qa_app.text_utils import normalize_text
 
 
@@ -19,6 +24,12 @@ class Category(models.Model):
 
 
 class QAEntry(models.Model):
+    class EmbeddingStatus(models.TextChoices):
+        PENDING = "pending", "Очікує"
+        PROCESSING = "processing", "Обробляється"
+        READY = "ready", "Готово"
+        FAILED = "failed", "Помилка"
+
     question = models.TextField("Питання", unique=True)
     synonyms = models.TextField(
         "Синоніми", blank=True, null=True,
@@ -33,6 +44,18 @@ class QAEntry(models.Model):
         blank=True, null=True,
         dimensions=getattr(settings, "EMBED_DIMENSIONS", 1536)
     )
+    # sha256(модель, розмірність, нормалізовані варіанти) на момент останнього перерахунку embedding-ів
+    embedding_fingerprint = models.CharField(max_length=64, blank=True, default="", editable=False)
+    # стан фонової генерації embedding-ів (див. qa_app.services.embedding_jobs / manage.py embedding_worker)
+    embedding_status = models.CharField(
+        "Embedding",
+        max_length=16,
+        choices=EmbeddingStatus.choices,
+        default=EmbeddingStatus.PENDING,
+        editable=False,
+        db_index=True,
+    )
+    embedding_status_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Питання і відповідь"
@@ -58,25 +81,71 @@ class QAEntry(models.Model):
     @transaction.atomic
     def save(self, *args, **kwargs):
         """
-        1) Зберігаємо сам QAEntry.
-        2) Перегенеровуємо варіанти (питання + синоніми) у таблиці QAVariant з ОКРЕМИМИ embedding.
-        3) Поле embedding у QAEntry оновлюємо embedding-ом головного питання (можна прибрати згодом).
-        Нормалізація тексту виконується перед побудовою ембедінга, щоб пошук був нечутливим до регістру / пунктуації.
+        Інкрементальне збереження без мережевих викликів:
+        1) порівнюємо поточні QAVariant з новим get_variants_list();
+        2) видаляємо лише прибрані, додані створюємо з embedding=NULL;
+        3) якщо бракує векторів — ставимо embedding_status=pending, їх порахує фоновий воркер
+           (manage.py embedding_worker) поза транзакцією запиту; пошук ігнорує варіанти без embedding;
+        4) якщо змінились тільки відповідь/категорія — варіанти не чіпаємо.
+        При EMBEDDING_JOBS_ASYNC=False вектори рахуються одразу після коміту (в тому ж процесі).
         """
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"question", "synonyms"} & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        variants = self.get_variants_list()
+        norm_texts = [normalize_text(text) for text in variants]
+
+        existing: dict[str, QAVariant] = {}
+        if self.pk and not self._state.adding:
+            for v in QAVariant.objects.filter(entry_id=self.pk).only("id", "text", "embedding"):
+                existing[v.text] = v
+        # Запис у стані ready з fingerprint, що не збігається з наявними текстами, рахувався іншою
+        # моделлю — такі вектори відкидаємо. У pending/processing fingerprint ще не оновлено воркером.
+        # Порожній fingerprint — записи, створені до міграції 0016: невідомо, тож довіряємо збереженим векторам.
+        stale = (
+            bool(existing)
+            and self.embedding_status == self.EmbeddingStatus.READY
+            and bool(self.embedding_fingerprint)
+            and self.embedding_fingerprint != texts_fingerprint([normalize_text(t) for t in existing])
+        )
+
+        removed = [v.pk for text, v in existing.items() if text not in variants]
+        kept = [v for text, v in existing.items() if text in variants]
+        added = [text for text in variants if text not in existing]
+        vectors = {v.text: (None if stale else v.embedding) for v in kept}
 
-        # 3. QAEntry.embedding = embedding головного питання (для сумісності)
         q = (self.question or "").strip()
-        norm_q = normalize_text(q)
-        self.embedding = embed_text_sync(norm_q) if q else None
-        super().save(update_fields=["embedding"])
+        self.embedding = vectors.get(variants[0]) if q else None
+        if added or any(vec is None for vec in vectors.values()):
+            self.embedding_status = self.EmbeddingStatus.PENDING
+        else:
+            self.embedding_status = self.EmbeddingStatus.READY
+            self.embedding_fingerprint = texts_fingerprint(norm_texts)
+        self.embedding_status_at = timezone.now()
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {
+                "embedding", "embedding_fingerprint", "embedding_status", "embedding_status_at",
+            }
+        super().save(*args, **kwargs)
+
+        if removed:
+            QAVariant.objects.filter(pk__in=removed).delete()
+        if kept and stale:
+            QAVariant.objects.filter(pk__in=[v.pk for v in kept]).update(embedding=None)
+        if added:
+            QAVariant.objects.bulk_create([
+                QAVariant(entry=self, text=text, normalized_text=normalize_text(text)) for text in added
+            ])
+        if removed or (kept and stale):
+            # bulk-операції не шлють сигналів — скидаємо in-memory індекс після коміту
+            transaction.on_commit(vector_index.invalidate)
+        if removed or added:
+            transaction.on_commit(lexical_index.invalidate)
 
-        # 2. повністю перебудовуємо QAVariant
-        QAVariant.objects.filter(entry=self).delete()
-        for text in self.get_variants_list():
-            norm_text = normalize_text(text)
-            vec = embed_text_sync(norm_text)
-            QAVariant.objects.create(entry=self, text=text, embedding=vec)
+        if self.embedding_status == self.EmbeddingStatus.PENDING:
+            from qa_app.services.embedding_jobs import enqueue_entry
+            enqueue_entry(self.pk)
 
 
 class QAVariant(models.Model):
@@ -87,6 +156,8 @@ class QAVariant(models.Model):
         db_index=True,
     )
     text = models.TextField("Варіант", db_index=True)
+    # normalize_text(text): ключ точного збігу (без embeddings) і токени для BM25
+    normalized_text = models.TextField(db_index=True, default="", editable=False)
     embedding = VectorField(
         blank=True, null=True,
         dimensions=getattr(settings, "EMBED_DIMENSIONS", 1536)
@@ -99,6 +170,13 @@ class QAVariant(models.Model):
     def __str__(self):
         return f"[{self.entry_id}] {self.text}"
 
+    def save(self, *args, **kwargs):
+        self.normalized_text = normalize_text(self.text)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "text" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"normalized_text"}
+        super().save(*args, **kwargs)
+
 
 class UnansweredQuestion(models.Model):
     question = models.TextField("Питання без відповіді", unique=True)
@@ -143,7 +221,8 @@ class QuestionLog(models.Model):
     question = models.TextField("Запит користувача")
     answer_found = models.BooleanField("Відповідь знайдена")
     similarity = models.FloatField("Схожість", blank=True, null=True)
-    timestamp = models.DateTimeField("Час запиту", auto_now_add=True)
+    # не auto_now_add: журнал пишеться у фоні пакетами (services.log_sink), і час запиту передається явно
+    timestamp = models.DateTimeField("Час запиту", default=timezone.now, editable=False)
 
     # ⬇️ НОВЕ: хто задав (зв'язок із AllowedTelegramUser)
     asked_by = models.ForeignKey(
@@ -154,10 +233,74 @@ class QuestionLog(models.Model):
         related_name="question_logs",
         db_index=True,
     )
+    # запис, яким відповіли (для зведень по категоріях); None — відповідь не знайдена
+    entry = models.ForeignKey(
+        QAEntry,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name="Відповідь",
+        related_name="question_logs",
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = "Запит користувача"
         verbose_name_plural = "Запити користувачів"
+        # таблиця секціонована помісячно за timestamp (міграція 0019, qa_app.services.log_partitions);
+        # первинний ключ у БД — (id, timestamp), id унікальний завдяки спільній послідовності
+        indexes = [
+            models.Index(fields=["timestamp"], name="questionlog_ts_idx"),
+            models.Index(fields=["answer_found", "timestamp"], name="questionlog_found_ts_idx"),
+            # admin search_fields (icontains) компілюється в UPPER("question"::text) LIKE UPPER(...),
+            # тому триграмний індекс — саме по UPPER(question)
+            GinIndex(OpClass(Upper("question"), name="gin_trgm_ops"), name="questionlog_question_trgm"),
+        ]
 
     def __str__(self):
         return self.question
+
+
+class QuestionLogDailyRollup(models.Model):
+    """
+    Денне зведення QuestionLog у розрізі (користувач, категорія) — для аналітики,
+    яка не читає сирий журнал і переживає видалення старих секцій.
+    Заповнюється командою rollup_question_logs (qa_app.services.log_rollup).
+    """
+    HISTOGRAM_BUCKETS = 10  # кошики схожості по 0.1: [<0.1, 0.1–0.2, ..., >=0.9]
+
+    day = models.DateField("День", db_index=True)
+    asked_by = models.ForeignKey(
+        AllowedTelegramUser,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name="Хто задав",
+        related_name="daily_rollups",
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name="Категорія",
+        related_name="daily_rollups",
+    )
+    total = models.PositiveIntegerField("Запитів", default=0)
+    answered = models.PositiveIntegerField("З відповіддю", default=0)
+    similarity_sum = models.FloatField("Сума схожості", default=0.0)
+    similarity_count = models.PositiveIntegerField("Запитів зі схожістю", default=0)
+    similarity_histogram = models.JSONField("Гістограма схожості", default=list, blank=True)
+
+    class Meta:
+        verbose_name = "Денна статистика запитів"
+        verbose_name_plural = "Денна статистика запитів"
+        ordering = ("-day",)
+
+    def __str__(self):
+        return f"{self.day}: {self.total}"
+
+    @property
+    def hit_rate(self) -> float:
+        return self.answered / self.total if self.total else 0.0
+
+    @property
+    def avg_similarity(self) -> float | None:
+        return self.similarity_sum / self.similarity_count if self.similarity_count else None
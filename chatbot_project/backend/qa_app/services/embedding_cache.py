@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from backend.core.redis_client import REDIS_ERRORS, get_async_redis, get_redis
+
+logger = logging.getLogger("qa_app")
+
+KEY_PREFIX = "emb:v1:"
+
+
+def _encode(vec) -> bytes:
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def _decode(raw: bytes) -> List[float]:
+    return np.frombuffer(raw, dtype=np.float32).tolist()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed кеш embedding-ів з двома рівнями:
+      1) in-process LRU (OrderedDict) — без мережі;
+      2) спільний Redis (якщо REDIS_URL задано) — між воркерами і перезапусками.
+    Ключ: sha256(model, dimensions, текст), значення: float32-байти (4 байти на вимір).
+    Будь-які помилки Redis не ламають пошук — просто йдемо в OpenAI.
+    """
+
+    def __init__(self, maxsize: int | None = None, ttl: int | None = None):
+        self._lru: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize if maxsize is not None else int(getattr(settings, "EMBED_CACHE_SIZE", 4096))
+        self._ttl = ttl if ttl is not None else int(getattr(settings, "EMBED_CACHE_TTL", 30 * 24 * 3600))
+        self._stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(model: str, dimensions: int, text: str) -> str:
+        # текст уже нормалізований викликачем (normalize_text); тут лише стискаємо пробіли
+        norm = " ".join((text or "").split())
+        digest = hashlib.sha256(f"{model}\x00{dimensions}\x00{norm}".encode("utf-8")).hexdigest()
+        return KEY_PREFIX + digest
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+            total = sum(self._stats.values())
+        if total % 500 == 0:
+            logger.info("Embedding cache stats: %s", self.stats())
+
+    def _lru_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            raw = self._lru.get(key)
+            if raw is not None:
+                self._lru.move_to_end(key)
+            return raw
+
+    def _lru_set(self, key: str, raw: bytes) -> None:
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            self._lru[key] = raw
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._maxsize:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        raw = self._lru_get(key)
+        if raw is not None:
+            self._count("lru_hits")
+            return _decode(raw)
+
+        client = get_redis()
+        if client is not None:
+            try:
+                raw = client.get(key)
+            except REDIS_ERRORS as exc:
+                logger.warning("Embedding cache: redis get failed: %s", exc)
+                raw = None
+            if raw is not None:
+                self._lru_set(key, raw)
+                self._count("redis_hits")
+                return _decode(raw)
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, vec) -> None:
+        raw = _encode(vec)
+        self._lru_set(key, raw)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(key, raw, ex=self._ttl)
+            except REDIS_ERRORS as exc:
+                logger.warning("Embedding cache: redis set failed: %s", exc)
+
+    async def aget(self, key: str) -> Optional[List[float]]:
+        """Те саме, що get(), але Redis-рівень через redis.asyncio (без блокування event loop)."""
+        raw = self._lru_get(key)
+        if raw is not None:
+            self._count("lru_hits")
+            return _decode(raw)
+
+        client = get_async_redis()
+        if client is not None:
+            try:
+                raw = await client.get(key)
+            except REDIS_ERRORS as exc:
+                logger.warning("Embedding cache: redis get failed: %s", exc)
+                raw = None
+            if raw is not None:
+                self._lru_set(key, raw)
+                self._count("redis_hits")
+                return _decode(raw)
+
+        self._count("misses")
+        return None
+
+    async def aset(self, key: str, vec) -> None:
+        raw = _encode(vec)
+        self._lru_set(key, raw)
+        client = get_async_redis()
+        if client is not None:
+            try:
+                await client.set(key, raw, ex=self._ttl)
+            except REDIS_ERRORS as exc:
+                logger.warning("Embedding cache: redis set failed: %s", exc)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["lru_size"] = len(self._lru)
+        lookups = out["lru_hits"] + out["redis_hits"] + out["misses"]
+        out["hit_rate"] = round((out["lru_hits"] + out["redis_hits"]) / lookups, 4) if lookups else 0.0
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+
+embedding_cache = EmbeddingCache()
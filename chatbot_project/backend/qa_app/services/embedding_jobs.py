@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from qa_app.models import QAEntry, QAVariant
+from qa_app.services.embeddings import embed_texts_sync, texts_fingerprint
+from qa_app.services.vector_index import vector_index
+from qa_app.text_utils import normalize_text
+
+logger = logging.getLogger("qa_app")
+
+Status = QAEntry.EmbeddingStatus
+
+
+def enqueue_entry(entry_id: int) -> None:
+    """
+    Черга — це самі рядки QAEntry зі статусом pending (Postgres, SKIP LOCKED).
+    Якщо фоновий режим вимкнено (EMBEDDING_JOBS_ASYNC=False) — рахуємо одразу після коміту,
+    все одно поза транзакцією збереження.
+    """
+    if getattr(settings, "EMBEDDING_JOBS_ASYNC", True):
+        return
+    transaction.on_commit(lambda: process_entry(entry_id))
+
+
+def claim_pending(queryset, limit: int) -> List[int]:
+    """
+    Забираємо до limit рядків у роботу (pending → processing) короткою транзакцією.
+    Повторно беремо «завислі» processing і failed, старші за таймаути.
+    queryset — модель з полями embedding_status / embedding_status_at (QAEntry, Instruction).
+    """
+    now = timezone.now()
+    claim_timeout = int(getattr(settings, "EMBEDDING_JOB_CLAIM_TIMEOUT", 600))
+    retry_delay = int(getattr(settings, "EMBEDDING_JOB_RETRY_SECONDS", 60))
+    with transaction.atomic():
+        ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(
+                Q(embedding_status=Status.PENDING)
+                | Q(embedding_status=Status.PROCESSING, embedding_status_at__lt=now - timedelta(seconds=claim_timeout))
+                | Q(embedding_status=Status.FAILED, embedding_status_at__lt=now - timedelta(seconds=retry_delay))
+            )
+            .order_by("embedding_status_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if ids:
+            queryset.filter(pk__in=ids).update(embedding_status=Status.PROCESSING, embedding_status_at=now)
+    return ids
+
+
+def claim_pending_entries(limit: int) -> List[int]:
+    return claim_pending(QAEntry.objects.all(), limit)
+
+
+def process_entry(entry_id: int) -> bool:
+    """
+    Рахує embedding-и для варіантів запису з embedding=NULL.
+    Якщо fingerprint запису порожній (reindex_embeddings / requeue в адмінці, записи до міграції 0016) —
+    перераховує всі варіанти, перезаписуючи старі вектори на місці: до завершення пошук працює по них.
+    Мережевий виклик — поза транзакцією; запис результату — коротка транзакція з блокуванням QAEntry.
+    Повертає True, якщо запис став ready.
+    """
+    fingerprint = QAEntry.objects.filter(pk=entry_id).values_list("embedding_fingerprint", flat=True).first()
+    refresh_all = not fingerprint
+    variants_qs = QAVariant.objects.filter(entry_id=entry_id)
+    if not refresh_all:
+        variants_qs = variants_qs.filter(embedding__isnull=True)
+    pending = list(variants_qs.only("id", "text"))
+    vectors = embed_texts_sync([normalize_text(v.text) for v in pending]) if pending else []
+
+    with transaction.atomic():
+        entry = QAEntry.objects.select_for_update().filter(pk=entry_id).first()
+        if entry is None:
+            return False
+        for variant, vec in zip(pending, vectors):
+            # варіант міг бути видалений/змінений, поки ми ходили в OpenAI
+            target = QAVariant.objects.filter(pk=variant.pk, text=variant.text)
+            if not refresh_all:
+                target = target.filter(embedding__isnull=True)
+            target.update(embedding=vec)
+
+        variants = list(QAVariant.objects.filter(entry_id=entry_id).only("text", "embedding"))
+        ready = all(v.embedding is not None for v in variants)
+        question = (entry.question or "").strip()
+        entry.embedding = next((v.embedding for v in variants if v.text == question), None)
+        entry.embedding_status = Status.READY if ready else Status.PENDING
+        entry.embedding_status_at = timezone.now()
+        fields = ["embedding", "embedding_status", "embedding_status_at"]
+        if ready:
+            entry.embedding_fingerprint = texts_fingerprint([normalize_text(v.text) for v in variants])
+            fields.append("embedding_fingerprint")
+        # update_fields без question/synonyms — QAEntry.save() не чіпає варіанти
+        entry.save(update_fields=fields)
+        transaction.on_commit(vector_index.invalidate)
+    return ready
+
+
+def process_pending(limit: int = 20) -> int:
+    """Обробник для manage.py embedding_worker: повертає кількість оброблених записів."""
+    ids = claim_pending_entries(limit)
+    for entry_id in ids:
+        try:
+            process_entry(entry_id)
+        except Exception:
+            logger.exception("Embedding job failed for QAEntry id=%s", entry_id)
+            QAEntry.objects.filter(pk=entry_id, embedding_status=Status.PROCESSING).update(
+                embedding_status=Status.FAILED, embedding_status_at=timezone.now()
+            )
+    return len(ids)
@@ -1,35 +1,160 @@
+import hashlib
 import os
+import random
+import weakref
 from typing import List
-from openai import OpenAI
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 import asyncio
 
-# ЧИТАЄМО ЛИШЕ ЦІ ДВІ ЗМІННІ
+from backend.core.redis_client import close_on_loop_shutdown
+from qa_app.services.embedding_cache import embedding_cache
+
+# ЧИТАЄМО ЛИШЕ ЦІ ЗМІННІ ОТОЧЕННЯ
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 EMBED_DIM = int(os.getenv("EMBED_DIMENSIONS", "1536"))
+# скільки текстів відправляємо в одному запиті embeddings (API приймає масив input)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# мережа: таймаут запиту, повтори з jitter, пул з'єднань і ліміт одночасних запитів async-клієнта
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_POOL_SIZE = int(os.getenv("EMBED_POOL_SIZE", "32"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "16"))
+
+_client = OpenAI(timeout=EMBED_TIMEOUT, max_retries=EMBED_MAX_RETRIES)
+
+_RETRYABLE = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+# AsyncOpenAI/httpx-пул і семафор прив'язані до event loop — тримаємо по одному на loop
+# (третій елемент — сторож, що закриває клієнт разом із loop, див. close_on_loop_shutdown)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[AsyncOpenAI, asyncio.Semaphore, object]]" = (
+    weakref.WeakKeyDictionary()
+)
 
-_client = OpenAI()
+def _fit_dim(vec: List[float]) -> List[float]:
+    # Нормалізуємо довжину під розмір колонки vector(EMBED_DIM)
+    if len(vec) > EMBED_DIM:
+        return vec[:EMBED_DIM]
+    if len(vec) < EMBED_DIM:
+        return vec + [0.0] * (EMBED_DIM - len(vec))
+    return vec
 
 def embed_text_sync(text: str) -> List[float]:
     """
     Повертає вектор рівно EMBED_DIM елементів (обрізка/доповнення нулями за потреби).
+    Спершу дивимось у кеш (LRU процесу → Redis), у OpenAI йдемо лише при промаху.
     """
     text = (text or "").strip()
     if not text:
         return [0.0] * EMBED_DIM
 
+    key = embedding_cache.key(OPENAI_EMBED_MODEL, EMBED_DIM, text)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
+
     resp = _client.embeddings.create(model=OPENAI_EMBED_MODEL, input=text)
-    vec = resp.data[0].embedding
+    vec = _fit_dim(resp.data[0].embedding)
 
-    # Нормалізуємо довжину під розмір колонки vector(EMBED_DIM)
-    if len(vec) > EMBED_DIM:
-        vec = vec[:EMBED_DIM]
-    elif len(vec) < EMBED_DIM:
-        vec = vec + [0.0] * (EMBED_DIM - len(vec))
+    embedding_cache.set(key, vec)
     return vec
 
-async def embed_text_async(texts):
+def embed_texts_sync(texts: List[str]) -> List[List[float]]:
+    """
+    Пакетна версія embed_text_sync: повертає вектори у порядку texts.
+    - дублікати відправляються один раз;
+    - тексти, що вже є в кеші, в OpenAI не йдуть;
+    - решта — запитами по EMBED_BATCH_SIZE текстів (multi-input).
+    """
+    cleaned = [(t or "").strip() for t in texts]
+    vectors: dict[str, List[float]] = {}
+    missing: List[str] = []
+
+    for text in dict.fromkeys(cleaned):  # унікальні, порядок збережено
+        if not text:
+            vectors[text] = [0.0] * EMBED_DIM
+            continue
+        cached = embedding_cache.get(embedding_cache.key(OPENAI_EMBED_MODEL, EMBED_DIM, text))
+        if cached is not None:
+            vectors[text] = cached
+        else:
+            missing.append(text)
+
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        chunk = missing[start:start + EMBED_BATCH_SIZE]
+        resp = _client.embeddings.create(model=OPENAI_EMBED_MODEL, input=chunk)
+        for item in resp.data:
+            text = chunk[item.index]
+            vec = _fit_dim(item.embedding)
+            vectors[text] = vec
+            embedding_cache.set(embedding_cache.key(OPENAI_EMBED_MODEL, EMBED_DIM, text), vec)
+
+    return [vectors[text] for text in cleaned]
+
+def texts_fingerprint(texts: List[str]) -> str:
+    """
+    Відбиток набору текстів разом із моделлю та розмірністю:
+    якщо він не змінився — наявні embedding-и актуальні і перераховувати їх не треба.
+    Порядок текстів не важливий (множина), щоб його можна було порахувати і по рядках QAVariant.
+    """
+    unique = sorted({(t or "").strip() for t in texts})
+    payload = "\x00".join([OPENAI_EMBED_MODEL, str(EMBED_DIM), *unique])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _get_async_client() -> tuple[AsyncOpenAI, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=EMBED_POOL_SIZE,
+                max_keepalive_connections=EMBED_POOL_SIZE,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(EMBED_TIMEOUT, connect=min(EMBED_TIMEOUT, 5.0)),
+        )
+        # повтори робимо самі (з jitter), тому вбудовані в SDK вимикаємо
+        client = AsyncOpenAI(http_client=http_client, max_retries=0, timeout=EMBED_TIMEOUT)
+        state = (client, asyncio.Semaphore(EMBED_MAX_CONCURRENCY), close_on_loop_shutdown(loop, client.close))
+        _async_clients[loop] = state
+    return state[0], state[1]
+
+async def _create_with_retries(client: AsyncOpenAI, text: str):
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return await client.embeddings.create(model=OPENAI_EMBED_MODEL, input=text)
+        except _RETRYABLE:
+            if attempt >= EMBED_MAX_RETRIES:
+                raise
+            # exponential backoff з «full jitter», щоб паралельні запити не билися синхронно
+            await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * 2 ** attempt)))
+
+async def embed_text_async(text: str) -> List[float]:
     """
-    Async-обгортка над embed_text_sync, щоб не ламати існуючі імпорти.
-    Виконуємо синхронний розрахунок у thread-пулі.
+    Нативна async-версія embed_text_sync на AsyncOpenAI (httpx keep-alive пул на event loop).
+    Кількість одночасних запитів до OpenAI обмежена EMBED_MAX_CONCURRENCY — пошуки
+    масштабуються за конкурентністю, а не за розміром thread-пулу.
     """
-    return await asyncio.to_thread(embed_text_sync, texts)
+    text = (text or "").strip()
+    if not text:
+        return [0.0] * EMBED_DIM
+
+    key = embedding_cache.key(OPENAI_EMBED_MODEL, EMBED_DIM, text)
+    cached = await embedding_cache.aget(key)
+    if cached is not None:
+        return cached
+
+    client, semaphore = _get_async_client()
+    async with semaphore:
+        resp = await _create_with_retries(client, text)
+    vec = _fit_dim(resp.data[0].embedding)
+
+    await embedding_cache.aset(key, vec)
+    return vec
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Count, Max
+from rank_bm25 import BM25Okapi
+
+from qa_app.text_utils import normalize_text
+
+logger = logging.getLogger("qa_app")
+
+
+class LexicalHit(NamedTuple):
+    entry_id: int
+    score: float        # BM25 (для ранжування)
+    confidence: float   # Жаккар токенів запиту і варіанта, 0..1 (для порогу short-circuit)
+
+
+def all_variants_signature() -> tuple[int, int]:
+    """(кількість, max id) усіх QAVariant — лексичному індексу embedding не потрібен."""
+    from qa_app.models import QAVariant
+
+    agg = QAVariant.objects.aggregate(n=Count("id"), max_id=Max("id"))
+    return int(agg["n"] or 0), int(agg["max_id"] or 0)
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize_text(text).split()
+
+
+class LexicalIndex:
+    """
+    Лексичний індекс QAVariant для одного воркера:
+    - exact: словник normalized_text -> entry_id (точний збіг без embeddings);
+    - BM25 (rank-bm25) по токенах normalized_text.
+
+    Токени кожного варіанта кешуються за id; при змінах (сигнал у цьому процесі або зміна
+    all_variants_signature() в іншому) дочитуємо з БД лише нові id і викидаємо видалені.
+    Статистику BM25 (idf, avgdl) перераховуємо ліниво, при першому BM25-пошуку після змін.
+    """
+
+    def __init__(self, check_seconds: float | None = None):
+        self._lock = threading.Lock()
+        self._docs: dict[int, tuple[int, List[str]]] = {}  # variant_id -> (entry_id, tokens)
+        self._exact: dict[str, int] = {}
+        self._order: List[int] = []
+        self._bm25: Optional[BM25Okapi] = None
+        self._bm25_dirty = True
+        self._signature: Optional[tuple[int, int]] = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._check_seconds = check_seconds
+
+    @property
+    def check_seconds(self) -> float:
+        if self._check_seconds is not None:
+            return self._check_seconds
+        return float(getattr(settings, "SEARCH_INDEX_CHECK_SECONDS", 30))
+
+    def invalidate(self, variant_id: int | None = None) -> None:
+        """variant_id — варіант, змінений на місці (той самий id): його токени перечитаємо з БД."""
+        if variant_id is not None:
+            with self._lock:
+                self._docs.pop(variant_id, None)
+                self._signature = None  # exact-словник і BM25 перебудувати навіть без нових id
+        self._stale = True
+
+    def _sync(self) -> None:
+        from qa_app.models import QAVariant
+
+        signature = all_variants_signature()
+        current = set(QAVariant.objects.values_list("id", flat=True))
+        removed = self._docs.keys() - current
+        added = current - self._docs.keys()
+
+        for variant_id in removed:
+            del self._docs[variant_id]
+        if added:
+            rows = QAVariant.objects.filter(id__in=added).values_list("id", "entry_id", "normalized_text")
+            for variant_id, entry_id, norm in rows.iterator(chunk_size=2000):
+                self._docs[variant_id] = (entry_id, norm.split())
+
+        if removed or added or self._signature is None:
+            exact: dict[str, int] = {}
+            # при однаковому тексті у кількох записах перемагає найстаріший варіант
+            for variant_id in sorted(self._docs):
+                entry_id, tokens = self._docs[variant_id]
+                if tokens:
+                    exact.setdefault(" ".join(tokens), entry_id)
+            self._exact = exact
+            self._bm25_dirty = True
+            logger.info("LexicalIndex synced: %d variants (+%d / -%d)", len(self._docs), len(added), len(removed))
+
+        self._signature = signature
+        self._stale = False
+        self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        if not self._stale and time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if self._stale or self._signature is None:
+                self._sync()
+            elif time.monotonic() - self._checked_at >= self.check_seconds:
+                if all_variants_signature() != self._signature:
+                    self._sync()
+                else:
+                    self._checked_at = time.monotonic()
+
+    def _ensure_bm25(self) -> None:
+        with self._lock:
+            if not self._bm25_dirty:
+                return
+            self._order = [vid for vid in sorted(self._docs) if self._docs[vid][1]]
+            corpus = [self._docs[vid][1] for vid in self._order]
+            self._bm25 = BM25Okapi(corpus) if corpus else None
+            self._bm25_dirty = False
+
+    def exact(self, norm_query: str) -> Optional[int]:
+        """entry_id варіанта, чий normalized_text дорівнює вже нормалізованому запиту, або None."""
+        self._ensure_fresh()
+        return self._exact.get(norm_query) if norm_query else None
+
+    def search(self, query: str, k: int = 5) -> List[LexicalHit]:
+        """До k варіантів з BM25 > 0, за спаданням BM25 (entry_id може повторюватись)."""
+        self._ensure_fresh()
+        self._ensure_bm25()
+        q_tokens = tokenize(query)
+        bm25, order = self._bm25, self._order
+        if not q_tokens or bm25 is None:
+            return []
+
+        scores = bm25.get_scores(q_tokens)
+        ranked = sorted(range(len(order)), key=lambda i: scores[i], reverse=True)[:k]
+        q_set = set(q_tokens)
+        hits = []
+        for i in ranked:
+            if scores[i] <= 0:
+                break
+            entry_id, tokens = self._docs[order[i]]
+            d_set = set(tokens)
+            hits.append(LexicalHit(entry_id, float(scores[i]), len(q_set & d_set) / len(q_set | d_set)))
+        return hits
+
+
+# один індекс на процес (воркер)
+lexical_index = LexicalIndex()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import re
+from datetime import date, datetime
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+
+# QuestionLog секціоновано помісячно за timestamp (міграція 0019):
+# qa_app_questionlog_pYYYYMM — секція місяця (межі — у settings.TIME_ZONE),
+# qa_app_questionlog_default — рядки, для яких секції ще немає.
+PARENT_TABLE = "qa_app_questionlog"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+ENSURE_FUNCTION = f"{PARENT_TABLE}_ensure_partition"
+_PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def is_partitioned(connection=None) -> bool:
+    connection = connection or default_connection
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [PARENT_TABLE],
+        )
+        return bool(cur.fetchone()[0])
+
+
+def ensure_partitions(first: date, last: date, connection=None) -> List[str]:
+    """
+    Створює секції для всіх місяців від first до last включно (наявні не чіпає).
+    Рядки цього місяця, що вже лежать у default-секції, переносяться в нову.
+    """
+    connection = connection or default_connection
+    names = []
+    month = month_start(first)
+    with connection.cursor() as cur:
+        while month <= last:
+            cur.execute(f"SELECT {ENSURE_FUNCTION}(%s, %s)", [month, settings.TIME_ZONE])
+            names.append(cur.fetchone()[0])
+            month = add_months(month, 1)
+    return names
+
+
+def list_partitions(connection=None) -> Dict[date, str]:
+    """{перший день місяця: ім'я секції}; default-секція не входить."""
+    connection = connection or default_connection
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cur.fetchall()]
+    partitions = {}
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return dict(sorted(partitions.items()))
+
+
+def drop_partition(name: str, connection=None) -> None:
+    if not _PARTITION_RE.match(name):
+        raise ValueError(f"Not a QuestionLog partition: {name}")
+    connection = connection or default_connection
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"')
+        cur.execute(f'DROP TABLE "{name}"')
+
+
+def default_partition_days(before: datetime, connection=None) -> List[date]:
+    """Дні (у TIME_ZONE), рядки яких старіші за before і лежать у default-секції."""
+    connection = connection or default_connection
+    with connection.cursor() as cur:
+        cur.execute(
+            f'SELECT DISTINCT ("timestamp" AT TIME ZONE %s)::date FROM {DEFAULT_PARTITION} '
+            f'WHERE "timestamp" < %s ORDER BY 1',
+            [settings.TIME_ZONE, before],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def purge_default_partition(before: datetime, connection=None) -> int:
+    connection = connection or default_connection
+    with connection.cursor() as cur:
+        cur.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" < %s', [before])
+        return cur.rowcount
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from qa_app.models import QuestionLog, QuestionLogDailyRollup
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """[початок, кінець) доби в поточній TIME_ZONE."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(day, time.min, tzinfo=tz),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def _histogram_aggregates() -> dict:
+    n = QuestionLogDailyRollup.HISTOGRAM_BUCKETS
+    aggregates = {}
+    for i in range(n):
+        # крайні кошики відкриті: від'ємна схожість — у першому, 1.0 — в останньому
+        bucket = Q(similarity__isnull=False)
+        if i > 0:
+            bucket &= Q(similarity__gte=i / n)
+        if i < n - 1:
+            bucket &= Q(similarity__lt=(i + 1) / n)
+        aggregates[f"bucket_{i}"] = Count("id", filter=bucket)
+    return aggregates
+
+
+def rollup_day(day: date) -> int:
+    """
+    Перераховує зведення за день (ідемпотентно: рядки дня замінюються).
+    Якщо сирих логів за день уже немає (секцію видалено) — наявне зведення лишається.
+    Повертає кількість рядків зведення.
+    """
+    start, end = day_bounds(day)
+    histogram = _histogram_aggregates()
+    rows = list(
+        QuestionLog.objects
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .values("asked_by_id", category_id=F("entry__category_id"))
+        .annotate(
+            total=Count("id"),
+            answered=Count("id", filter=Q(answer_found=True)),
+            similarity_sum=Sum("similarity"),
+            similarity_count=Count("similarity"),
+            **histogram,
+        )
+        .order_by()
+    )
+    if not rows:
+        return 0
+
+    rollups = [
+        QuestionLogDailyRollup(
+            day=day,
+            asked_by_id=row["asked_by_id"],
+            category_id=row["category_id"],
+            total=row["total"],
+            answered=row["answered"],
+            similarity_sum=row["similarity_sum"] or 0.0,
+            similarity_count=row["similarity_count"],
+            similarity_histogram=[row[key] for key in histogram],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        QuestionLogDailyRollup.objects.filter(day=day).delete()
+        QuestionLogDailyRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def rollup_days(days: Iterable[date]) -> int:
+    return sum(rollup_day(day) for day in days)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from qa_app.models import AllowedTelegramUser, QAEntry, QuestionLog, UnansweredQuestion
+
+logger = logging.getLogger("qa_app")
+
+
+class QuestionLogSink:
+    """
+    Буфер журналу запитів поза шляхом відповіді:
+    - view кладе запис у чергу процесу (без звернення до БД) і одразу відповідає;
+    - фоновий потік скидає чергу bulk_create-ом кожні QUESTION_LOG_FLUSH_SECONDS
+      або раніше, коли назбиралось QUESTION_LOG_BATCH записів;
+    - UnansweredQuestion вставляємо одним INSERT ... ON CONFLICT DO NOTHING (ignore_conflicts);
+    - при завершенні процесу (atexit) залишок скидається синхронно.
+    timestamp — час виклику asubmit (не час flush), передається явно.
+    """
+
+    # якщо БД недоступна довго — не тримаємо в пам'яті більше за це, найстаріші записи відкидаємо
+    MAX_PENDING = 10_000
+
+    def __init__(self):
+        self._queue: deque = deque(maxlen=self.MAX_PENDING)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "QUESTION_LOG_ASYNC", True)
+
+    @property
+    def batch_size(self) -> int:
+        return int(getattr(settings, "QUESTION_LOG_BATCH", 100))
+
+    @property
+    def interval(self) -> float:
+        return float(getattr(settings, "QUESTION_LOG_FLUSH_SECONDS", 2))
+
+    async def asubmit(self, *, question: str, answer_found: bool, similarity: float | None,
+                      asked_by=None, entry=None, unanswered: bool = False) -> None:
+        record = {
+            "question": question,
+            "answer_found": answer_found,
+            "similarity": similarity,
+            "asked_by_id": getattr(asked_by, "pk", None),
+            "entry_id": getattr(entry, "pk", None),
+            "unanswered": unanswered,
+            # час запиту, а не час flush
+            "timestamp": timezone.now(),
+        }
+        if not self.enabled:
+            await sync_to_async(self._write)([record])
+            return
+
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                logger.warning("QuestionLog buffer full, dropping the oldest record")
+            self._queue.append(record)
+            pending = len(self._queue)
+            self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="question-log-sink", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            # потік живе довго — не тримаємо протухлі з'єднання (CONN_MAX_AGE)
+            close_old_connections()
+
+    def flush(self) -> int:
+        """
+        Скидає все, що є в черзі; повертає кількість записаних QuestionLog.
+        Пакет, що не записався, повторюємо поштучно — втрачаються лише погані рядки, а flush іде далі.
+        Якщо БД недоступна (OperationalError) — пакет повертаємо в чергу і чекаємо наступного тику.
+        """
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+            if not batch:
+                return written
+            try:
+                self._write(batch)
+                written += len(batch)
+            except OperationalError:
+                logger.exception("QuestionLog flush failed, %d records requeued", len(batch))
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                return written
+            except DatabaseError:
+                written += self._write_rows(batch)
+
+    def _write_rows(self, records: list[dict]) -> int:
+        written = 0
+        for record in records:
+            try:
+                self._write([record])
+                written += 1
+            except DatabaseError:
+                logger.exception("QuestionLog record lost: %r", record["question"][:200])
+        return written
+
+    @staticmethod
+    def _existing_ids(model, ids) -> set:
+        ids = {i for i in ids if i is not None}
+        return set(model.objects.filter(pk__in=ids).values_list("pk", flat=True)) if ids else set()
+
+    @transaction.atomic
+    def _write(self, records: list[dict]) -> None:
+        # одна транзакція на пакет: при помилці не лишаємо вже вставлених QuestionLog,
+        # інакше повтор (поштучний чи після requeue) дублював би їх
+        # користувача/запис могли видалити між asubmit і flush — як і SET_NULL, лишаємо лог без посилання
+        users = self._existing_ids(AllowedTelegramUser, (r["asked_by_id"] for r in records))
+        entries = self._existing_ids(QAEntry, (r["entry_id"] for r in records))
+        QuestionLog.objects.bulk_create([
+            QuestionLog(
+                question=r["question"],
+                answer_found=r["answer_found"],
+                similarity=r["similarity"],
+                asked_by_id=r["asked_by_id"] if r["asked_by_id"] in users else None,
+                entry_id=r["entry_id"] if r["entry_id"] in entries else None,
+                timestamp=r["timestamp"],
+            )
+            for r in records
+        ])
+        unanswered = list(dict.fromkeys(r["question"] for r in records if r["unanswered"]))
+        if unanswered:
+            UnansweredQuestion.objects.bulk_create(
+                [UnansweredQuestion(question=q) for q in unanswered], ignore_conflicts=True
+            )
+
+
+question_log_sink = QuestionLogSink()
+atexit.register(question_log_sink.flush)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+logger = logging.getLogger("qa_app")
+
+
+def variants_signature() -> tuple[int, int, float]:
+    """
+    Дешевий «відбиток» стану QAVariant: (кількість, max id) варіантів з готовим embedding
+    плюс max(QAEntry.embedding_status_at).
+    QAEntry.save() видаляє/створює варіанти, тож зсуває (кількість, max id); а перерахунок векторів
+    на місці (embedding worker, requeue в адмінці, reindex/regenerate_embeddings — ті самі id)
+    завжди оновлює embedding_status_at запису.
+    """
+    from qa_app.models import QAEntry, QAVariant
+
+    agg = QAVariant.objects.exclude(embedding__isnull=True).aggregate(n=Count("id"), max_id=Max("id"))
+    updated_at = QAEntry.objects.aggregate(at=Max("embedding_status_at"))["at"]
+    return int(agg["n"] or 0), int(agg["max_id"] or 0), updated_at.timestamp() if updated_at else 0.0
+
+
+class VectorIndex:
+    """
+    In-memory індекс варіантів для одного воркера:
+      - matrix: суцільна float32-матриця (N x D) нормалізованих embedding-ів
+      - entry_ids: масив entry_id для кожного рядка матриці
+    Пошук top-k = один matrix-vector product (cosine similarity = dot для одиничних векторів).
+
+    Індекс вантажиться ліниво при першому пошуку і перечитується, коли:
+      - у цьому процесі спрацював сигнал збереження/видалення QAVariant (invalidate());
+      - змінився variants_signature() (перевіряємо не частіше ніж раз на CHECK_SECONDS),
+        що покриває зміни, зроблені іншими воркерами.
+    """
+
+    def __init__(self, check_seconds: float | None = None):
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._entry_ids: Optional[np.ndarray] = None
+        self._signature: Optional[tuple[int, int, float]] = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._check_seconds = check_seconds
+
+    @property
+    def check_seconds(self) -> float:
+        if self._check_seconds is not None:
+            return self._check_seconds
+        return float(getattr(settings, "SEARCH_INDEX_CHECK_SECONDS", 30))
+
+    def __len__(self) -> int:
+        return 0 if self._entry_ids is None else int(self._entry_ids.shape[0])
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def _load(self) -> None:
+        from qa_app.models import QAVariant
+
+        signature = variants_signature()
+        rows = (
+            QAVariant.objects
+            .exclude(embedding__isnull=True)
+            .order_by("id")
+            .values_list("entry_id", "embedding")
+        )
+        entry_ids: List[int] = []
+        vectors: List[np.ndarray] = []
+        for entry_id, emb in rows.iterator(chunk_size=2000):
+            entry_ids.append(entry_id)
+            vectors.append(np.asarray(emb, dtype=np.float32))
+
+        if vectors:
+            matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0  # нульові вектори (порожній текст) лишаються нульовими
+            matrix /= norms
+        else:
+            matrix = np.empty((0, int(getattr(settings, "EMBED_DIMENSIONS", 1536))), dtype=np.float32)
+
+        self._matrix = matrix
+        self._entry_ids = np.asarray(entry_ids, dtype=np.int64)
+        self._signature = signature
+        self._stale = False
+        self._checked_at = time.monotonic()
+        logger.info("VectorIndex loaded: %d variants", len(entry_ids))
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if not self._stale and now - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if self._stale or self._matrix is None:
+                self._load()
+                return
+            if time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            if variants_signature() != self._signature:
+                self._load()
+            else:
+                self._checked_at = time.monotonic()
+
+    def search(self, q_vec, k: int = 1) -> List[Tuple[int, float]]:
+        """
+        Повертає до k пар (entry_id, similarity) для найближчих ВАРІАНТІВ,
+        відсортованих за спаданням схожості (entry_id може повторюватись).
+        """
+        self._ensure_fresh()
+        matrix, entry_ids = self._matrix, self._entry_ids
+        if matrix is None or entry_ids is None or not len(entry_ids):
+            return []
+
+        q = np.asarray(q_vec, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0:
+            return []
+        scores = matrix @ (q / norm)
+
+        k = max(1, min(int(k), scores.shape[0]))
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top])]
+        return [(int(entry_ids[i]), float(scores[i])) for i in top]
+
+
+# один індекс на процес (воркер)
+vector_index = VectorIndex()
@@ -1,25 +1,58 @@
 from __future__ import annotations
 
-from typing import List, Tuple
-from django.db import connection
+from typing import List, Sequence, Tuple
+from django.conf import settings
+from django.db import connection, transaction
+
+# Імена ANN-індексів на qa_app_qavariant.embedding (див. міграцію 0015 і команду ann_index)
+HNSW_INDEX = "qa_variant_embedding_hnsw"
+IVFFLAT_INDEX = "qa_variant_embedding_ivfflat"
+
+
+def vector_literal(query_vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{float(x):.8f}" for x in query_vector) + "]"
+
+
+def apply_ann_settings(cursor, *, ef_search: int | None = None, probes: int | None = None) -> None:
+    """
+    Параметри точності ANN-пошуку на поточну транзакцію (аналог SET LOCAL):
+      - hnsw.ef_search  — ширина пошуку HNSW (більше = точніше, повільніше)
+      - ivfflat.probes  — кількість списків IVFFlat, які переглядаємо
+    Працює лише всередині transaction.atomic(); поза транзакцією значення одразу скидається.
+    """
+    if ef_search is None:
+        ef_search = int(getattr(settings, "SEARCH_HNSW_EF_SEARCH", 40))
+    if probes is None:
+        probes = int(getattr(settings, "SEARCH_IVFFLAT_PROBES", 10))
+    cursor.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+        [str(ef_search), str(probes)],
+    )
+
 
 def pg_cosine_topk(query_vector: List[float], top_k: int = 5) -> list[Tuple]:
     """
-    Прямий пошук у Postgres з pgvector: повертає (id, question, answer, cosine_distance).
+    Прямий пошук у Postgres з pgvector по QAVariant:
+    повертає (entry_id, question, answer, cosine_distance) для top_k найближчих ВАРІАНТІВ.
+    Спочатку обираємо варіанти (тут працює ANN-індекс), потім приєднуємо QAEntry.
     """
     if not query_vector:
         return []
 
-    vector_str = "[" + ",".join(f"{float(x):.8f}" for x in query_vector) + "]"
-
     sql = """
-        SELECT id, question, answer,
-               embedding <#> %s::vector AS cosine_distance
-        FROM qa_app_qaentry
-        ORDER BY cosine_distance ASC
-        LIMIT %s
+        SELECT e.id, e.question, e.answer, v.cosine_distance
+        FROM (
+            SELECT entry_id, embedding <=> %s::vector AS cosine_distance
+            FROM qa_app_qavariant
+            WHERE embedding IS NOT NULL
+            ORDER BY cosine_distance ASC
+            LIMIT %s
+        ) v
+        JOIN qa_app_qaentry e ON e.id = v.entry_id
+        ORDER BY v.cosine_distance ASC
     """
 
-    with connection.cursor() as cur:
-        cur.execute(sql, [vector_str, top_k])
+    with transaction.atomic(), connection.cursor() as cur:
+        apply_ann_settings(cur)
+        cur.execute(sql, [vector_literal(query_vector), top_k])
         return cur.fetchall()
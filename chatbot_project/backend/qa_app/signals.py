@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from backend.core.auth import invalidate_telegram_users
+from qa_app.models import AllowedTelegramUser, QAVariant
+from qa_app.services.lexical_index import lexical_index
+from qa_app.services.vector_index import vector_index
+
+
+@receiver(post_save, sender=QAVariant)
+@receiver(post_delete, sender=QAVariant)
+def _invalidate_search_indexes(sender, instance, **kwargs):
+    # QAEntry.save() перебудовує варіанти — локальні індекси воркера перечитаємо при наступному пошуку
+    vector_index.invalidate()
+    lexical_index.invalidate(instance.pk)
+
+
+@receiver(pre_save, sender=AllowedTelegramUser)
+def _remember_telegram_id(sender, instance, **kwargs):
+    # Telegram ID могли змінити в адмінці — скинемо кеш і для старого значення
+    instance._previous_user_id = (
+        sender.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=AllowedTelegramUser)
+@receiver(post_delete, sender=AllowedTelegramUser)
+def _invalidate_auth_cache(sender, instance, **kwargs):
+    user_ids = {instance.user_id, getattr(instance, "_previous_user_id", None)} - {None}
+    transaction.on_commit(lambda: invalidate_telegram_users(*user_ids))
@@ -1,22 +1,65 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import connection, transaction
 from pgvector.django import CosineDistance
 
 from qa_app.models import QAEntry, QAVariant
 from qa_app.services.embeddings import embed_text_async
+from qa_app.services.lexical_index import lexical_index
+from qa_app.services.vector_index import vector_index
+from qa_app.services.vector_search import apply_ann_settings
 from qa_app.text_utils import normalize_text
 
 TOP_K = getattr(settings, "SEARCH_TOP_K", 5)
 SIM_THRESHOLD = getattr(settings, "SEARCH_SIM_THRESHOLD", 0.35)
+# "pg" — пошук у Postgres (pgvector), "memory" — in-process NumPy індекс воркера
+VECTOR_BACKEND = getattr(settings, "SEARCH_VECTOR_BACKEND", "pg")
+# "vector" — лише embeddings; "hybrid" — BM25 + вектор, злиті через Reciprocal Rank Fusion
+SEARCH_MODE = getattr(settings, "SEARCH_MODE", "vector")
+# лексична впевненість (Жаккар токенів), з якої відповідаємо без виклику embeddings; 0 — вимкнено
+LEXICAL_SHORTCUT = getattr(settings, "SEARCH_LEXICAL_SHORTCUT", 0.9)
+RRF_K = getattr(settings, "SEARCH_RRF_K", 60)
 
 
-def _query_best_sync(q_vec) -> Optional[tuple[QAEntry, float]]:
+def _group_by_entry(hits, limit: int) -> List[Tuple[object, float]]:
+    """
+    hits — (entry | entry_id, similarity) для ВАРІАНТІВ, відсортовані за спаданням.
+    Кілька варіантів одного запису зливаємо в один результат з максимальною схожістю.
+    """
+    best: dict = {}
+    for key, similarity in hits:
+        entry_id = getattr(key, "pk", key)
+        if entry_id not in best or similarity > best[entry_id][1]:
+            best[entry_id] = (key, similarity)
+    ranked = sorted(best.values(), key=lambda item: item[1], reverse=True)
+    return ranked[:limit]
+
+
+def _query_topk_memory_sync(q_vec, k: int, limit: int) -> List[Tuple[QAEntry, float]]:
+    """
+    Top-k через in-memory VectorIndex: один matrix-vector product замість seq scan у Postgres,
+    потім один запит in_bulk за самими записами.
+    """
+    grouped = _group_by_entry(vector_index.search(q_vec, k=k), limit)
+    if not grouped:
+        return []
+
+    entries = QAEntry.objects.in_bulk([entry_id for entry_id, _ in grouped])
+    if len(entries) < len(grouped):
+        # запис видалено після завантаження індексу
+        vector_index.invalidate()
+    return [(entries[entry_id], sim) for entry_id, sim in grouped if entry_id in entries]
+
+
+def _query_topk_sync(q_vec, k: int, limit: int) -> List[Tuple[QAEntry, float]]:
     """
     Шукаємо по QAVariant (питання + кожен синонім має власний embedding).
-    Беремо мінімальну cosine distance та повертаємо (entry, similarity).
+    Одним запитом беремо k найближчих варіантів разом із їхніми QAEntry,
+    групуємо за записом (max similarity) і повертаємо до limit різних записів.
+    ef_search/probes для ANN-індексу виставляємо на транзакцію запиту.
     """
     qs = (
         QAVariant.objects
@@ -24,35 +67,143 @@ def _query_best_sync(q_vec) -> Optional[tuple[QAEntry, float]]:
         .annotate(distance=CosineDistance("embedding", q_vec))
         .select_related("entry")
         .order_by("distance")
-        .only("id", "entry_id", "text")
+        .defer("embedding", "entry__embedding")
     )
-    best = qs.first()
-    if not best:
-        return None
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            apply_ann_settings(cur)
+        variants = list(qs[:k])
 
-    dist = float(getattr(best, "distance", 1.0))
-    similarity = 1.0 - dist
-    return best.entry, similarity
+    hits = [(v.entry, 1.0 - float(getattr(v, "distance", 1.0))) for v in variants]
+    return _group_by_entry(hits, limit)
 
 
-async def find_best_match(question: str) -> Tuple[Optional[QAEntry], Optional[float]]:
+def _lexical_matches_sync(hits, limit: int) -> List[Tuple[QAEntry, float]]:
+    """Результат лише з BM25 (short-circuit): записи за спаданням лексичної впевненості."""
+    grouped = _group_by_entry([(h.entry_id, h.confidence) for h in hits], limit)
+    entries = QAEntry.objects.in_bulk([entry_id for entry_id, _ in grouped])
+    return [(entries[entry_id], conf) for entry_id, conf in grouped if entry_id in entries]
+
+
+def _cosine_by_entry_sync(q_vec, entry_ids) -> dict:
+    """Косинусна схожість запиту з найближчим варіантом кожного з entry_ids (лише для них, без ANN)."""
+    rows = (
+        QAVariant.objects
+        .filter(entry_id__in=entry_ids)
+        .exclude(embedding__isnull=True)
+        .annotate(distance=CosineDistance("embedding", q_vec))
+        .values_list("entry_id", "distance")
+    )
+    best: dict = {}
+    for entry_id, distance in rows:
+        best[entry_id] = max(best.get(entry_id, -1.0), 1.0 - float(distance))
+    return best
+
+
+def _fuse_sync(q_vec, vector_matches, lexical_hits, limit: int) -> List[Tuple[QAEntry, float]]:
     """
-    Отримуємо embedding запиту та шукаємо найближчий варіант.
-    Фільтр по порогу SIM_THRESHOLD.
+    Reciprocal Rank Fusion: score = Σ 1 / (RRF_K + rank) по обох списках (ранги — по записах).
+    RRF визначає лише порядок; similarity — завжди косинусна (та сама шкала, що й SIM_THRESHOLD).
+    Для записів, знайдених лише BM25, косинусну схожість дораховуємо окремим запитом.
+    """
+    rrf: dict = {}
+    similarity: dict = {}
+    entries = {entry.pk: entry for entry, _ in vector_matches}
+
+    for rank, (entry, sim) in enumerate(vector_matches, start=1):
+        rrf[entry.pk] = rrf.get(entry.pk, 0.0) + 1.0 / (RRF_K + rank)
+        similarity[entry.pk] = sim
+
+    # ранг BM25 — за першою (найкращою) появою запису у видачі
+    lexical_rank: dict = {}
+    for hit in lexical_hits:
+        lexical_rank.setdefault(hit.entry_id, len(lexical_rank) + 1)
+    for entry_id, rank in lexical_rank.items():
+        rrf[entry_id] = rrf.get(entry_id, 0.0) + 1.0 / (RRF_K + rank)
+
+    missing = [entry_id for entry_id in rrf if entry_id not in entries]
+    if missing:
+        entries.update(QAEntry.objects.in_bulk(missing))
+        similarity.update(_cosine_by_entry_sync(q_vec, missing))
+
+    ranked = sorted((entry_id for entry_id in rrf if entry_id in entries), key=rrf.get, reverse=True)
+    return [(entries[entry_id], similarity.get(entry_id, 0.0)) for entry_id in ranked[:limit]]
+
+
+def _pin_first(pinned, matches, limit: int) -> List[Tuple[QAEntry, float]]:
+    """Результат короткого шляху — першим, решту limit-1 місць заповнює звичайний пошук."""
+    rest = [(entry, sim) for entry, sim in matches if entry.pk != pinned[0].pk]
+    return [pinned] + rest[:limit - 1]
+
+
+async def find_top_matches(question: str, limit: int = 1) -> List[Tuple[QAEntry, float]]:
+    """
+    До limit різних записів, найближчих до питання, з similarity (за спаданням), без порогу.
+    similarity — косинусна схожість embeddings (шкала SIM_THRESHOLD), крім коротких шляхів нижче.
 
     Важливо: перед побудовою ембедінга нормалізуємо текст (lowercase, видалення зайвої пунктуації),
     щоб пошук був нечутливий до регістру та простих варіацій написання.
+
+    Короткі шляхи визначають лише ПЕРШИЙ результат:
+    - запит після normalize_text дослівно збігається з варіантом — similarity 1.0;
+    - SEARCH_MODE="hybrid" і лексична впевненість (Жаккар) >= SEARCH_LEXICAL_SHORTCUT — окремо
+      відкалібрований поріг, similarity = ця впевненість.
+    При limit == 1 embeddings не рахуємо; при limit > 1 решту місць заповнює звичайний пошук
+    (у hybrid — BM25 і вектор, злиті через RRF).
     """
     norm_q = normalize_text(question)
+    pinned = None
+
+    # точний збіг з питанням/синонімом: similarity 1.0 без embeddings
+    entry_id = await sync_to_async(lexical_index.exact)(norm_q)
+    if entry_id is not None:
+        entry = await QAEntry.objects.filter(pk=entry_id).afirst()
+        if entry is not None:
+            pinned = (entry, 1.0)
+        else:
+            lexical_index.invalidate()
+
+    # варіантів беремо із запасом: кілька синонімів одного запису можуть зайняти весь top-k
+    k = max(TOP_K, limit * 4)
+
+    lexical_hits = []
+    if SEARCH_MODE == "hybrid":
+        lexical_hits = await sync_to_async(lexical_index.search)(norm_q, k)
+        if (pinned is None and LEXICAL_SHORTCUT and lexical_hits
+                and max(h.confidence for h in lexical_hits) >= LEXICAL_SHORTCUT):
+            top = await sync_to_async(_lexical_matches_sync)(lexical_hits, 1)
+            pinned = top[0] if top else None
+
+    if pinned is not None and limit == 1:
+        return [pinned]
+
     q_vec = await embed_text_async(norm_q)
     if not q_vec:
-        return None, None
+        return [pinned] if pinned is not None else []
+
+    # +1 — запас на випадок, якщо закріплений запис є і у звичайній видачі
+    want = limit + 1 if pinned is not None else limit
+    query_sync = _query_topk_memory_sync if VECTOR_BACKEND == "memory" else _query_topk_sync
+    if not lexical_hits:
+        matches = await sync_to_async(query_sync)(q_vec, k, want)
+    else:
+        # для злиття беремо всю векторну видачу (до k записів), обрізаємо вже після RRF
+        vector_matches = await sync_to_async(query_sync)(q_vec, k, k)
+        matches = await sync_to_async(_fuse_sync)(q_vec, vector_matches, lexical_hits, want)
+
+    return _pin_first(pinned, matches, limit) if pinned is not None else matches[:limit]
+
 
-    result = await sync_to_async(_query_best_sync)(q_vec)
-    if not result:
+async def find_best_match(question: str) -> Tuple[Optional[QAEntry], Optional[float]]:
+    """
+    Отримуємо embedding запиту та шукаємо найближчий варіант.
+    Фільтр по порогу SIM_THRESHOLD.
+    """
+    matches = await find_top_matches(question, limit=1)
+    if not matches:
         return None, None
 
-    entry, sim = result
+    entry, sim = matches[0]
     if sim is None or sim < SIM_THRESHOLD:
         return None, sim
     return entry, sim
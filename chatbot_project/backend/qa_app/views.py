@@ -1,13 +1,27 @@
 import json
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import UnansweredQuestion, QuestionLog, AllowedTelegramUser
-from .utils import find_best_match
+from .services.log_sink import question_log_sink
+from .utils import SIM_THRESHOLD, find_top_matches
 from backend.core.security import require_api_key
 from backend.core.auth import require_telegram_access
 
 
+MAX_RESULTS = getattr(settings, "SEARCH_MAX_RESULTS", 5)
+SUGGEST_THRESHOLD = getattr(settings, "SEARCH_SUGGEST_THRESHOLD", 0.2)
+
+
+def _result_payload(entry, similarity):
+    return {
+        "id": entry.pk,
+        "question": entry.question,
+        "answer": entry.answer,
+        "similarity": round(float(similarity), 4),
+    }
+
+
 @csrf_exempt
 @require_api_key
 @require_telegram_access
@@ -25,46 +39,51 @@ async def search_answer(request):
     if not question:
         return JsonResponse({"error": "Field 'question' is required"}, status=400)
 
-    # --- хто задав (беремо із заголовка, який уже пройшов require_telegram_access)
-    asked_by = None
-    tg_header = request.headers.get("X-Telegram-Id")
-    if tg_header:
-        try:
-            uid = int(tg_header)
-            # користувач гарантовано існує і активний (перевірено у декораторі),
-            # але зробимо захищений пошук на випадок гонок/деактивації
-            asked_by = await AllowedTelegramUser.objects.aget(user_id=uid)
-        except (ValueError, AllowedTelegramUser.DoesNotExist):
-            asked_by = None
+    # limit > 1 — додатково повертаємо "results": кілька різних записів для "можливо, ви мали на увазі"
+    try:
+        limit = min(max(int(data.get("limit") or 1), 1), MAX_RESULTS)
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Field 'limit' must be an integer"}, status=400)
+
+    # --- хто задав: користувача вже знайшов (і закешував) require_telegram_access
+    asked_by = getattr(request, "telegram_user", None)
 
-    # --- основний пошук
-    entry, similarity = await find_best_match(question)
+    # --- основний пошук (один запит top-k, згрупований за записами)
+    matches = await find_top_matches(question, limit=limit)
+    entry, similarity = matches[0] if matches else (None, None)
+    if entry is not None and similarity < SIM_THRESHOLD:
+        entry = None
+    suggestions = [_result_payload(e, sim) for e, sim in matches if sim >= SUGGEST_THRESHOLD]
 
     if entry:
-        await QuestionLog.objects.acreate(
+        await question_log_sink.asubmit(
             question=question,
             answer_found=True,
             similarity=float(round(similarity, 6)),
             asked_by=asked_by,
+            entry=entry,
         )
-        return JsonResponse({
+        payload = {
             "answer": entry.answer,
             "similarity": round(float(similarity), 4)
-        })
-
-    # якщо не знайшли — зберігаємо питання як "без відповіді" (мінімум 3 слова)
-    if len(question.split()) >= 3:
-        exists = await UnansweredQuestion.objects.filter(question=question).aexists()
-        if not exists:
-            await UnansweredQuestion.objects.acreate(question=question)
+        }
+        if limit > 1:
+            payload["results"] = suggestions
+        return JsonResponse(payload)
 
-    await QuestionLog.objects.acreate(
+    # якщо не знайшли — зберігаємо питання як "без відповіді" (мінімум 3 слова);
+    # запис у БД — у фоні, пакетом (qa_app.services.log_sink), з ON CONFLICT DO NOTHING
+    await question_log_sink.asubmit(
         question=question,
         answer_found=False,
         similarity=float(round((similarity or 0.0), 6)),
         asked_by=asked_by,
+        unanswered=len(question.split()) >= 3,
     )
 
-    return JsonResponse({
+    payload = {
         "answer": "Вибачте, відповідь на Ваше питання не знайдена. Я передаю його для обробки адміністратору."
-    }, status=404)
+    }
+    if limit > 1:
+        payload["results"] = suggestions
+    return JsonResponse(payload, status=404)
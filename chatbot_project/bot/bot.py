@@ -7,7 +7,11 @@ from urllib.parse import urlencode, urlparse
 from pathlib import Path
 import asyncio
 import os
-import requests
+import random
+import uuid
+from collections import OrderedDict
+from typing import Any, NamedTuple
+import httpx
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher, F
@@ -19,6 +23,7 @@ from aiogram.types import (
     InlineKeyboardButton,
     CallbackQuery,
 )
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
@@ -35,6 +40,16 @@ API_PREFIX = parsed.path.rstrip("/")                    # напр., /api
 DJANGO_API_KEY = os.getenv("DJANGO_API_KEY", "")
 DJANGO_HMAC_SECRET = os.getenv("DJANGO_HMAC_SECRET", "")
 DEFAULT_TIMEOUT = 10
+# повтори запитів до бекенду: GET — на мережеві збої та 502/503/504, POST — лише якщо запит не відправлено
+API_MAX_RETRIES = int(os.getenv("BOT_API_RETRIES", "2"))
+API_POOL_SIZE = int(os.getenv("BOT_API_POOL_SIZE", "20"))
+# кеш GET-відповідей каталогу/інструкцій: скільки вважати свіжими (сек) і скільки тримати записів
+CACHE_TTL = int(os.getenv("BOT_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("BOT_CACHE_MAX_ENTRIES", "512"))
+# скільки (сек) довіряти останній успішній перевірці доступу користувача бекендом
+AUTH_TTL = int(os.getenv("BOT_AUTH_TTL", "60"))
+# де зберігати file_id зображень інструкцій між перезапусками
+FILE_ID_STORE = Path(os.getenv("BOT_FILE_ID_STORE") or Path(__file__).resolve().parent / ".file_ids.json")
 
 bot = Bot(token=os.environ["TELEGRAM_TOKEN"])
 dp = Dispatcher(storage=MemoryStorage())
@@ -52,14 +67,14 @@ def _count_words_ua(text: str) -> int:
     return len([w for w in cleaned.split() if w])
 
 # ---------- HMAC-підпис ----------
-def _make_signature(method: str, full_path: str, body_bytes: bytes) -> tuple[str, str, str]:
+def _make_signature(method: str, full_path: str, body_bytes: bytes, nonce: str) -> tuple[str, str, str]:
     """
-    Підписуємо рядок: "<ts>\n<METHOD>\n<full_path>\n<sha256(body)>".
+    Підписуємо рядок: "<ts>\n<METHOD>\n<full_path>\n<sha256(body)>\n<nonce>".
     Повертає (timestamp, "v1=<sig>", content_sha256_hex).
     """
     ts = str(int(time.time()))
     content_hash = hashlib.sha256(body_bytes or b"").hexdigest()
-    to_sign = "\n".join([ts, method.upper(), full_path, content_hash]).encode("utf-8")
+    to_sign = "\n".join([ts, method.upper(), full_path, content_hash, nonce]).encode("utf-8")
     sig = hmac.new(DJANGO_HMAC_SECRET.encode("utf-8"), to_sign, hashlib.sha256).hexdigest()
     return ts, f"v1={sig}", content_hash
 
@@ -89,41 +104,215 @@ def _full_path_for_sig(path: str, params: dict | None) -> str:
     return base
 
 # --- HTTP-хелпери (підписані) ---
-def api_get(
+# Один пул з'єднань (keep-alive) на весь бот; створюється в main() і закривається при зупинці.
+http_client: httpx.AsyncClient | None = None
+
+# запит гарантовано не дійшов до бекенду — безпечно повторювати навіть POST
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUSES = {502, 503, 504}
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=API_ORIGIN,
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(max_connections=API_POOL_SIZE, max_keepalive_connections=API_POOL_SIZE),
+    )
+
+async def _signed_request(
+    method: str,
+    full_path: str,
+    body: bytes,
+    *,
+    user_id: int | None,
+    want_json: bool,
+    timeout: float,
+    extra_headers: dict | None = None,
+) -> httpx.Response:
+    idempotent = method == "GET"
+    for attempt in range(API_MAX_RETRIES + 1):
+        # підписуємо кожну спробу заново (свіжий timestamp і новий одноразовий nonce)
+        nonce = uuid.uuid4().hex
+        ts, signature, content_hash = _make_signature(method, full_path, body, nonce)
+        headers = _base_headers(user_id, want_json=want_json) | {
+            "X-Nonce": nonce,
+            "X-Timestamp": ts,
+            "X-Signature": signature,
+            "X-Content-SHA256": content_hash,
+        } | (extra_headers or {})
+        try:
+            r = await http_client.request(
+                method, full_path, content=body or None, headers=headers, timeout=timeout
+            )
+        except _NOT_SENT_ERRORS:
+            if attempt >= API_MAX_RETRIES:
+                raise
+        except httpx.TransportError:
+            if not idempotent or attempt >= API_MAX_RETRIES:
+                raise
+        else:
+            if not (idempotent and r.status_code in _RETRY_STATUSES and attempt < API_MAX_RETRIES):
+                return r
+        await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+
+async def api_get(
     path: str,
     params: dict | None = None,
     *,
     user_id: int | None = None,
-    timeout: int = DEFAULT_TIMEOUT,
-):
-    full_path = _full_path_for_sig(path, params)         # те, що підписуємо
-    url = f"{API_ORIGIN}{full_path}"                     # ORIGIN + full_path (без повторного /api)
-    ts, signature, content_hash = _make_signature("GET", full_path, b"")
-    headers = _base_headers(user_id, want_json=False) | {
-        "X-Timestamp": ts,
-        "X-Signature": signature,
-        "X-Content-SHA256": content_hash,
-    }
-    return requests.get(url, headers=headers, params=None, timeout=timeout)
+    timeout: float = DEFAULT_TIMEOUT,
+    headers: dict | None = None,
+) -> httpx.Response:
+    full_path = _full_path_for_sig(path, params)         # те, що підписуємо і запитуємо (API_ORIGIN + full_path)
+    return await _signed_request(
+        "GET", full_path, b"", user_id=user_id, want_json=False, timeout=timeout, extra_headers=headers
+    )
 
-def api_post(
+async def api_post(
     path: str,
     json: dict | None = None,
     *,
     user_id: int | None = None,
-    timeout: int = DEFAULT_TIMEOUT,
-):
+    timeout: float = DEFAULT_TIMEOUT,
+) -> httpx.Response:
     # серіалізуємо самі, щоб байти підпису == байтам тіла запиту
     raw_body = pyjson.dumps(json or {}, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
     full_path = _full_path_for_sig(path, None)
-    url = f"{API_ORIGIN}{full_path}"                     # ORIGIN + full_path
-    ts, signature, content_hash = _make_signature("POST", full_path, raw_body)
-    headers = _base_headers(user_id, want_json=True) | {
-        "X-Timestamp": ts,
-        "X-Signature": signature,
-        "X-Content-SHA256": content_hash,
-    }
-    return requests.post(url, data=raw_body, headers=headers, timeout=timeout)
+    return await _signed_request("POST", full_path, raw_body, user_id=user_id, want_json=True, timeout=timeout)
+
+# ---------- Кеш GET-відповідей (TTL + LRU, ревалідація через ETag) ----------
+class CachedResponse(NamedTuple):
+    data: Any
+    etag: str | None
+    expires_at: float
+
+class ResponseCache:
+    """
+    LRU на CACHE_MAX_ENTRIES записів. Свіжий запис (молодший за CACHE_TTL) віддаємо без бекенду,
+    застарілий — ревалідуємо запитом з If-None-Match (304 продовжує життя без передачі тіла).
+    Відповіді каталогу однакові для всіх користувачів, тож ключ — лише шлях.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, data: Any, etag: str | None) -> None:
+        self._entries[key] = CachedResponse(data, etag, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+response_cache = ResponseCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+
+# user_id -> до якого моменту (monotonic) доступ вважається підтвердженим бекендом
+_authorized_until: dict[int, float] = {}
+
+def _remember_auth(user_id: int) -> None:
+    now = time.monotonic()
+    if len(_authorized_until) > 10_000:
+        for uid in [uid for uid, until in _authorized_until.items() if until <= now]:
+            del _authorized_until[uid]
+    _authorized_until[user_id] = now + AUTH_TTL
+
+async def cached_get(path: str, *, user_id: int) -> tuple[int, Any]:
+    """
+    (статус, дані) для GET без параметрів. Без звернення до бекенду — лише якщо запис свіжий
+    І доступ цього користувача підтверджено не пізніше AUTH_TTL тому; інакше умовний запит.
+    """
+    entry = response_cache.get(path)
+    now = time.monotonic()
+    if entry and entry.expires_at > now and _authorized_until.get(user_id, 0) > now:
+        return 200, entry.data
+
+    headers = {"If-None-Match": entry.etag} if entry and entry.etag else None
+    r = await api_get(path, user_id=user_id, headers=headers)
+    if r.status_code == 304 and entry:
+        response_cache.put(path, entry.data, entry.etag)
+        _remember_auth(user_id)
+        return 200, entry.data
+    if r.status_code == 200:
+        data = r.json()
+        response_cache.put(path, data, r.headers.get("ETag"))
+        _remember_auth(user_id)
+        return 200, data
+    if r.status_code in (401, 403):
+        _authorized_until.pop(user_id, None)
+    return r.status_code, None
+
+# ---------- Telegram file_id зображень інструкцій ----------
+class FileIdStore:
+    """
+    Після першої відправки зображення за URL Telegram повертає file_id — далі шлемо його,
+    і Telegram не завантажує картинку з нашого /media/ повторно.
+    Ключ — id інструкції + хеш image_url (нове зображення = новий URL = новий ключ).
+    Зберігаємо в невеликому JSON-файлі, записуючи атомарно (tmp + os.replace).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._ids: dict[str, str] | None = None
+
+    @staticmethod
+    def key(instruction_id: int, image_url: str) -> str:
+        return f"{instruction_id}:{hashlib.sha256(image_url.encode('utf-8')).hexdigest()[:16]}"
+
+    def _data(self) -> dict[str, str]:
+        if self._ids is None:
+            try:
+                self._ids = pyjson.loads(self.path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                self._ids = {}
+        return self._ids
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(pyjson.dumps(self._data(), ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            # не критично: file_id лишиться в пам'яті до перезапуску
+            print("FILE_ID STORE WRITE FAILED:", e)
+
+    def get(self, key: str) -> str | None:
+        return self._data().get(key)
+
+    def set(self, key: str, file_id: str) -> None:
+        data = self._data()
+        # старі file_id тієї ж інструкції (попередні зображення) більше не знадобляться
+        prefix = key.split(":", 1)[0] + ":"
+        for old in [k for k in data if k.startswith(prefix) and k != key]:
+            del data[old]
+        data[key] = file_id
+        self._save()
+
+    def discard(self, key: str) -> None:
+        if self._data().pop(key, None) is not None:
+            self._save()
+
+file_id_store = FileIdStore(FILE_ID_STORE)
+
+async def send_instruction_photo(message: Message, instruction_id: int, image_url: str, caption: str):
+    key = file_id_store.key(instruction_id, image_url)
+    file_id = file_id_store.get(key)
+    if file_id:
+        try:
+            await message.answer_photo(photo=file_id, caption=caption, parse_mode="HTML")
+            return
+        except TelegramBadRequest:
+            # file_id недійсний (напр., інший токен бота) — шлемо за URL і запам'ятовуємо новий
+            file_id_store.discard(key)
+
+    sent = await message.answer_photo(photo=image_url, caption=caption, parse_mode="HTML")
+    if sent.photo:
+        file_id_store.set(key, sent.photo[-1].file_id)
 
 # ---------- Головна клавіатура ----------
 main_keyboard = ReplyKeyboardMarkup(
@@ -168,7 +357,7 @@ async def ask_question(message: Message, state: FSMContext):
     await state.set_state(SearchMode.search_answer)
 
     # Діагностика: пінг беку з HMAC-підписом
-    r = api_get("/ping/", user_id=message.from_user.id)
+    r = await api_get("/ping/", user_id=message.from_user.id)
     print("PING RESPONSE:", r.status_code, r.text)
 
     await message.answer("Напишіть ваше питання:")
@@ -207,7 +396,7 @@ async def handle_feedback(message: Message, state: FSMContext):
         return
 
     try:
-        r = api_post(
+        r = await api_post(
             "/feedback/",
             json={"user_id": str(message.from_user.id), "message": feedback_text},
             user_id=message.from_user.id,
@@ -224,16 +413,34 @@ async def handle_feedback(message: Message, state: FSMContext):
     await state.set_state(SearchMode.idle)
 
 # ---------- Отримання інструкції (через меню категорій) ----------
+# Дерево каталогу — у response_cache: меню підкатегорій/інструкцій рендеримо локально,
+# а бекенд бачить лише умовні запити з If-None-Match, коли запис застарів (304 — без тіла).
+_catalogue: dict = {"categories": [], "by_category": {}, "by_subcategory": {}}
+
+async def load_catalogue(user_id: int) -> int:
+    """Актуалізує _catalogue; повертає 200 або 401/403 (інші статуси — виняток)."""
+    status, tree = await cached_get("/catalogue/", user_id=user_id)
+    if status in (401, 403):
+        return status
+    if status != 200:
+        raise RuntimeError(f"HTTP {status}")
+    if tree is not _catalogue["categories"]:
+        _catalogue.update(
+            categories=tree,
+            by_category={c["id"]: c["subcategories"] for c in tree},
+            by_subcategory={s["id"]: s["instructions"] for c in tree for s in c["subcategories"]},
+        )
+    return status
+
 @dp.message(F.text == "📄 Отримати інструкцію")
 async def get_instruction_entry(message: Message, state: FSMContext):
     await state.set_state(SearchMode.idle)
     try:
-        r = api_get("/categories/", user_id=message.from_user.id)
-        if r.status_code in (401, 403):
+        status = await load_catalogue(message.from_user.id)
+        if status in (401, 403):
             await message.answer("🚫 Доступ заборонено. Переконайтеся, що ваш Telegram ID додано в білий список.")
             return
-        r.raise_for_status()
-        categories = r.json()
+        categories = _catalogue["categories"]
 
         if not categories:
             await message.answer("Категорії ще не додано.")
@@ -246,17 +453,20 @@ async def get_instruction_entry(message: Message, state: FSMContext):
     except Exception as e:
         await message.answer(f"Помилка при отриманні категорій: {str(e)}")
 
+async def _catalogue_node(index: str, node_id: int, user_id: int) -> tuple[int, list | None]:
+    """(статус, вузол дерева) — з кешу, з ревалідацією, коли запис застарів."""
+    status = await load_catalogue(user_id)
+    return status, _catalogue[index].get(node_id)
+
 @dp.callback_query(F.data.startswith("cat_"))
 async def category_selected(callback: CallbackQuery):
-    category_id = callback.data.split("_", 1)[1]
+    category_id = int(callback.data.split("_", 1)[1])
     try:
-        r = api_get(f"/subcategories/{category_id}/", user_id=callback.from_user.id)
-        if r.status_code in (401, 403):
+        status, subs = await _catalogue_node("by_category", category_id, callback.from_user.id)
+        if status in (401, 403):
             await callback.message.answer("🚫 Доступ заборонено.")
             await callback.answer()
             return
-        r.raise_for_status()
-        subs = r.json()
 
         if not subs:
             await callback.message.answer("Немає підкатегорій для цієї категорії.")
@@ -273,15 +483,13 @@ async def category_selected(callback: CallbackQuery):
 
 @dp.callback_query(F.data.startswith("sub_"))
 async def subcategory_selected(callback: CallbackQuery):
-    sub_id = callback.data.split("_", 1)[1]
+    sub_id = int(callback.data.split("_", 1)[1])
     try:
-        r = api_get(f"/instructions/{sub_id}/", user_id=callback.from_user.id)
-        if r.status_code in (401, 403):
+        status, instrs = await _catalogue_node("by_subcategory", sub_id, callback.from_user.id)
+        if status in (401, 403):
             await callback.message.answer("🚫 Доступ заборонено.")
             await callback.answer()
             return
-        r.raise_for_status()
-        instrs = r.json()
 
         if not instrs:
             await callback.message.answer("Немає інструкцій у цій підкатегорії.")
@@ -298,19 +506,18 @@ async def subcategory_selected(callback: CallbackQuery):
 
 @dp.callback_query(F.data.startswith("instr_"))
 async def instruction_selected(callback: CallbackQuery):
-    instr_id = callback.data.split("_", 1)[1]
+    instr_id = int(callback.data.split("_", 1)[1])
     try:
-        r = api_get(f"/instruction/{instr_id}/", user_id=callback.from_user.id)
-        if r.status_code in (401, 403):
+        status, data = await cached_get(f"/instruction/{instr_id}/", user_id=callback.from_user.id)
+        if status in (401, 403):
             await callback.message.answer("🚫 Доступ заборонено.")
             await callback.answer()
             return
 
-        if r.status_code == 200:
-            data = r.json()
+        if status == 200:
             text = f"<b>{data['title']}</b>\n\n{data['content']}"
             if data.get("image_url"):
-                await callback.message.answer_photo(photo=data["image_url"], caption=text, parse_mode="HTML")
+                await send_instruction_photo(callback.message, instr_id, data["image_url"], text)
             else:
                 await callback.message.answer(text, parse_mode="HTML")
         else:
@@ -328,7 +535,7 @@ async def process_instruction_query(message: Message, state: FSMContext):
         return
 
     try:
-        r = api_get("/search_instructions/", params={"query": query}, user_id=message.from_user.id)
+        r = await api_get("/search_instructions/", params={"query": query}, user_id=message.from_user.id)
         if r.status_code in (401, 403):
             await message.answer("🚫 Доступ заборонено.")
             return
@@ -347,6 +554,34 @@ async def process_instruction_query(message: Message, state: FSMContext):
         await message.answer(f"⚠️ Помилка: {str(e)}")
 
 # ---------- Пошук відповіді ----------
+# Скільки "можливо, ви мали на увазі" показувати під відповіддю (бекенд віддає їх тим самим запитом)
+SEARCH_SUGGESTIONS = 3
+
+async def _offer_suggestions(message: Message, state: FSMContext, results: list[dict], title: str):
+    results = results[:SEARCH_SUGGESTIONS]
+    if not results:
+        return
+    # відповіді зберігаємо у FSM, щоб по кліку не ходити на бекенд вдруге
+    await state.update_data(suggestions={str(item["id"]): item["answer"] for item in results})
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=item["question"][:64], callback_data=f"qa_{item['id']}")]
+            for item in results
+        ]
+    )
+    await message.answer(title, reply_markup=kb)
+
+@dp.callback_query(F.data.startswith("qa_"))
+async def suggestion_selected(callback: CallbackQuery, state: FSMContext):
+    entry_id = callback.data.split("_", 1)[1]
+    data = await state.get_data()
+    answer = (data.get("suggestions") or {}).get(entry_id)
+    if answer:
+        await callback.message.answer(answer)
+    else:
+        await callback.message.answer("Підказка застаріла — поставте питання ще раз.")
+    await callback.answer()
+
 @dp.message(SearchMode.search_answer)
 async def handle_question(message: Message, state: FSMContext):
     question = (message.text or "").strip()
@@ -360,16 +595,23 @@ async def handle_question(message: Message, state: FSMContext):
         return
 
     try:
-        r = api_post("/search/", json={"question": question}, user_id=message.from_user.id)
+        r = await api_post(
+            "/search/",
+            json={"question": question, "limit": SEARCH_SUGGESTIONS + 1},
+            user_id=message.from_user.id,
+        )
 
         if r.status_code in (401, 403):
             await message.reply("🚫 Доступ заборонено. Зверніться до адміністратора.")
         elif r.status_code == 200:
             data = r.json()
             await message.reply(data.get("answer", "Відповідь не знайдена."))
+            # перший результат — це і є відповідь; решта — схожі питання
+            await _offer_suggestions(message, state, data.get("results", [])[1:], "Можливо, вас також цікавить:")
         elif r.status_code == 404:
             data = r.json()
             await message.reply(data.get("answer", "Вибачте, відповідь не знайдена."))
+            await _offer_suggestions(message, state, data.get("results", []), "Можливо, ви мали на увазі:")
         elif r.status_code == 429:
             try:
                 data = r.json()
@@ -385,7 +627,12 @@ async def handle_question(message: Message, state: FSMContext):
 
 # ---------- Точка входу ----------
 async def main():
-    await dp.start_polling(bot)
+    global http_client
+    http_client = create_http_client()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await http_client.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Навантажувальний бенчмарк API з HMAC-підписом (як у бота).
+
+Порівняння WSGI vs ASGI:
+  WEB_SERVER=wsgi docker compose up -d web && python scripts/bench_api.py --label wsgi
+  WEB_SERVER=asgi docker compose up -d web && python scripts/bench_api.py --label asgi
+
+За замовчуванням б'є в /api/ping/ (без rate limit). Потрібні змінні оточення
+DJANGO_API_KEY, DJANGO_HMAC_SECRET і Telegram ID з білого списку (--telegram-id).
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import statistics
+import time
+import uuid
+from urllib.parse import urlparse
+
+import httpx
+
+
+def _sign(secret: str, method: str, full_path: str, body: bytes) -> dict:
+    ts = str(int(time.time()))
+    nonce = uuid.uuid4().hex
+    content_hash = hashlib.sha256(body).hexdigest()
+    to_sign = "\n".join([ts, method.upper(), full_path, content_hash, nonce]).encode("utf-8")
+    sig = hmac.new(secret.encode("utf-8"), to_sign, hashlib.sha256).hexdigest()
+    return {"X-Timestamp": ts, "X-Nonce": nonce, "X-Signature": f"v1={sig}", "X-Content-SHA256": content_hash}
+
+
+async def _worker(client, args, full_path, latencies, statuses, remaining):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        headers = {
+            "X-API-Key": os.getenv("DJANGO_API_KEY", ""),
+            "X-Telegram-Id": str(args.telegram_id),
+            **_sign(os.getenv("DJANGO_HMAC_SECRET", ""), "GET", full_path, b""),
+        }
+        started = time.perf_counter()
+        try:
+            r = await client.get(full_path, headers=headers)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] = statuses.get(type(exc).__name__, 0) + 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("DJANGO_API_URL", "http://localhost:8000/api"))
+    parser.add_argument("--path", default="/ping/")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--telegram-id", type=int, required=True)
+    parser.add_argument("--label", default="")
+    args = parser.parse_args()
+
+    parsed = urlparse(args.url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    full_path = f"{parsed.path.rstrip('/')}{args.path}"
+
+    latencies, statuses, remaining = [], {}, [args.requests]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=origin, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _worker(client, args, full_path, latencies, statuses, remaining)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    print(
+        f"{args.label or origin}: {len(latencies)} req in {elapsed:.2f}s -> {len(latencies) / elapsed:.1f} req/s | "
+        f"avg {statistics.mean(latencies):.1f}ms p50 {pct(0.5):.1f}ms p95 {pct(0.95):.1f}ms p99 {pct(0.99):.1f}ms | "
+        f"statuses {statuses}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())